@@ -0,0 +1,72 @@
+"""
+Report how many bytes each loaded HospitalVisit costs.
+
+Generates a hospital directory of about the requested size in a temporary
+directory, then loads its admissions with loaddata while tracemalloc is
+tracing, both into a Hospital and into a columnar VisitStore.
+
+Usage:
+    python bench_memory.py [--visits N] [--patients N] [--doctors N]
+"""
+
+from __future__ import annotations
+import argparse
+import os
+import tempfile
+import tracemalloc
+import generate
+import hospital
+import loaddata
+
+# The number of days of visits generated.
+DAYS = 365
+
+
+def measure_hospital(path: str) -> int:
+    """ Return the bytes allocated by loading the admissions in <path> into a
+    Hospital whose patients are already loaded.
+    """
+    hosp = hospital.Hospital('Benchmark')
+    hosp.load_patients(os.path.join(path, 'patients.csv'))
+    tracemalloc.start()
+    hosp.load_admissions(os.path.join(path, 'admissions.csv'))
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+
+def measure_store(path: str) -> int:
+    """ Return the bytes allocated by loading the admissions in <path> into a
+    VisitStore.
+    """
+    tracemalloc.start()
+    store = loaddata.load_visit_store(os.path.join(path, 'admissions.csv'))
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+    return size
+
+
+def main() -> None:
+    """ Run the benchmark with the sizes given on the command line.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--visits', type=int, default=100000)
+    parser.add_argument('--patients', type=int, default=10000)
+    parser.add_argument('--doctors', type=int, default=100)
+    args = parser.parse_args()
+
+    visits_per_day = max(args.visits // DAYS, 1)
+    visits = visits_per_day * DAYS
+    with tempfile.TemporaryDirectory() as path:
+        generate.generate(path, args.patients, args.doctors,
+                          min(args.doctors, 10), visits_per_day)
+        for label, measure in [('Hospital', measure_hospital),
+                               ('VisitStore', measure_store)]:
+            size = measure(path)
+            print('{:<10} {:>12,} bytes  {:>7.1f} bytes/visit'.format(
+                label, size, size / visits))
+
+
+if __name__ == '__main__':
+    main()
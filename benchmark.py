@@ -0,0 +1,181 @@
+"""
+Time read_hospital and the public Hospital and Patient queries on generated
+hospitals of growing size, and report how each one scales.
+
+Each scale multiplies the number of patients, doctors, doctors per day and
+visits per day of the base hospital. The growth column is the exponent k
+in time ~ scale ** k between the smallest and the largest scale: about 0
+for a query that does not depend on the size of the hospital, 1 for one
+that is linear in it, and 2 or more for a quadratic hot spot.
+
+Usage:
+    python benchmark.py [--patients N] [--doctors N] [--doctors-per-day N]
+        [--visits-per-day N] [--days N] [--scales 1,2,4] [--calls N]
+"""
+
+from __future__ import annotations
+from typing import Callable, List, Tuple
+import argparse
+import datetime
+import math
+import random
+import tempfile
+import time
+import generate
+import hospital
+import loaddata
+
+START = datetime.date(1997, 1, 1)
+
+
+# Each query makes one call on a loaded hospital, with arguments picked by a
+# random number generator, given the days with attendance in the hospital.
+QUERIES: List[Tuple[str, Callable[[hospital.Hospital, List[datetime.date],
+                                   random.Random], object]]] = [
+    ('Hospital.projected_expenses',
+     lambda hosp, days, rand: hosp.projected_expenses()),
+    ('Hospital.actual_expenses',
+     lambda hosp, days, rand: hosp.actual_expenses()),
+    ('Hospital.expenses_by_doctor',
+     lambda hosp, days, rand: hosp.expenses_by_doctor(
+         START, START + datetime.timedelta(30))),
+    ('Hospital.expenses_by_month',
+     lambda hosp, days, rand: hosp.expenses_by_month(
+         START, START + datetime.timedelta(364))),
+    ('Hospital.expense_variance',
+     lambda hosp, days, rand: hosp.expense_variance(
+         START, START + datetime.timedelta(6), rand.choice(hosp.doctors))),
+    ('Hospital.reminders',
+     lambda hosp, days, rand: hosp.reminders(rand.choice(days), 3)),
+    ('Hospital.reminders_for_range',
+     lambda hosp, days, rand: hosp.reminders_for_range(
+         START, START + datetime.timedelta(30), 3)),
+    ('Hospital.patients_seen',
+     lambda hosp, days, rand: hosp.patients_seen(
+         rand.choice(hosp.doctors), START, START + datetime.timedelta(6))),
+    ('Hospital.busiest_doctors',
+     lambda hosp, days, rand: hosp.busiest_doctors(
+         START, START + datetime.timedelta(6))),
+    ('Hospital.busiest_doctors_by_window',
+     lambda hosp, days, rand: hosp.busiest_doctors_by_window(
+         START, START + datetime.timedelta(29), 7, 3)),
+    ('Hospital.patient_counts',
+     lambda hosp, days, rand: hosp.patient_counts(
+         START, START + datetime.timedelta(6))),
+    ('Hospital.visit_counts',
+     lambda hosp, days, rand: hosp.visit_counts(
+         START, START + datetime.timedelta(6))),
+    ('Hospital.coverage',
+     lambda hosp, days, rand: hosp.coverage(rand.choice(hosp.doctors),
+                                            rand.choice(hosp.doctors))),
+    ('Hospital.sick_days',
+     lambda hosp, days, rand: hosp.sick_days(rand.choice(hosp.doctors))),
+    ('Hospital.all_sick_days',
+     lambda hosp, days, rand: hosp.all_sick_days()),
+    ('Hospital.all_coverage',
+     lambda hosp, days, rand: hosp.all_coverage()),
+    ('Hospital.followup_compliance',
+     lambda hosp, days, rand: hosp.followup_compliance()),
+    ('Hospital.attended_to',
+     lambda hosp, days, rand: hosp.attended_to(rand.choice(hosp.patients))),
+    ('Hospital.prescribed_rate',
+     lambda hosp, days, rand: hosp.prescribed_rate(
+         rand.choice(hosp.doctors), rand.choice(generate.DRUGS))),
+    ('Hospital.prescription_rates',
+     lambda hosp, days, rand: hosp.prescription_rates()),
+    ('Hospital.top_medications',
+     lambda hosp, days, rand: hosp.top_medications(
+         3, rand.choice(hosp.doctors), START,
+         START + datetime.timedelta(30))),
+    ('Hospital.prescribed_patients',
+     lambda hosp, days, rand: hosp.prescribed_patients(
+         rand.choice(generate.DRUGS), rand.choice(days))),
+    ('Hospital.diagnosed_patients',
+     lambda hosp, days, rand: hosp.diagnosed_patients(
+         rand.choice(generate.DIAGNOSES), rand.choice(days))),
+    ('Patient.is_prescribed',
+     lambda hosp, days, rand: rand.choice(hosp.patients).is_prescribed(
+         rand.choice(generate.DRUGS))),
+    ('Patient.followups',
+     lambda hosp, days, rand: rand.choice(hosp.patients).followups(
+         rand.choice(hospital.MONTH_ABBREV))),
+    ('Patient.prescribed_after',
+     lambda hosp, days, rand: rand.choice(hosp.patients).prescribed_after(
+         rand.choice(days))),
+    ('Patient.missed_followups',
+     lambda hosp, days, rand: rand.choice(hosp.patients).missed_followups()),
+]
+
+
+def run_scale(path: str, calls: int) -> List[Tuple[str, float]]:
+    """ Return the seconds taken by read_hospital on the hospital directory
+    <path>, and then the mean seconds per call of each query over <calls>
+    calls. Query results are not cached, so that every call is timed, and
+    the days queries pick from are listed before any timing starts.
+    """
+    hosp = hospital.Hospital('Benchmark', cache_size=0)
+    began = time.perf_counter()
+    loaddata.read_hospital(hosp, path)
+    timings = [('loaddata.read_hospital', time.perf_counter() - began)]
+
+    days = list(hosp.attendance)
+    for label, query in QUERIES:
+        rand = random.Random(label)
+        began = time.perf_counter()
+        for _ in range(calls):
+            query(hosp, days, rand)
+        timings.append((label, (time.perf_counter() - began) / calls))
+    return timings
+
+
+def growth(scales: List[int], seconds: List[float]) -> float:
+    """ Return the exponent k for which <seconds> grows like scale ** k from
+    the first to the last of <scales>.
+
+    >>> growth([1, 4], [0.5, 8.0])
+    2.0
+    """
+    if len(scales) < 2 or min(seconds[0], seconds[-1]) <= 0:
+        return math.nan
+    return math.log(seconds[-1] / seconds[0]) / math.log(scales[-1] /
+                                                         scales[0])
+
+
+def main() -> None:
+    """ Generate a hospital at each scale given on the command line, and print
+    a table of the timings.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--patients', type=int, default=1000)
+    parser.add_argument('--doctors', type=int, default=20)
+    parser.add_argument('--doctors-per-day', type=int, default=4)
+    parser.add_argument('--visits-per-day', type=int, default=40)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--scales', default='1,2,4')
+    parser.add_argument('--calls', type=int, default=20)
+    args = parser.parse_args()
+    scales = [int(scale) for scale in args.scales.split(',')]
+
+    results = []
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as path:
+            generate.generate(path, args.patients * scale,
+                              args.doctors * scale,
+                              args.doctors_per_day * scale,
+                              args.visits_per_day * scale, START,
+                              START + datetime.timedelta(args.days))
+            results.append(run_scale(path + '/', args.calls))
+
+    print('{:<30}'.format('milliseconds per call') +
+          ''.join('{:>11}'.format('x{}'.format(scale)) for scale in scales) +
+          '{:>9}'.format('growth'))
+    for row in range(len(results[0])):
+        seconds = [timings[row][1] for timings in results]
+        print('{:<30}'.format(results[0][row][0]) +
+              ''.join('{:>11.3f}'.format(second * 1000)
+                      for second in seconds) +
+              '{:>9.2f}'.format(growth(scales, seconds)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""
+Write a synthetic hospital directory in the formats read by loaddata.
+
+The directory gets the same five files as data/year97/ -- doctors.csv,
+patients.csv, schedule.dat, attendance.dat and admissions.csv -- plus a
+README with the parameters used, at any size.
+
+Every day some doctors are scheduled to work. Most of them attend, a few
+are sick, and some of those are covered by a doctor who was not scheduled.
+Each visit is to a doctor who attended that day.
+
+Usage:
+    python generate.py DIRECTORY [--patients N] [--doctors N]
+        [--doctors-per-day N] [--visits-per-day N] [--start YYYY-MM-DD]
+        [--end YYYY-MM-DD] [--seed N]
+"""
+
+from __future__ import annotations
+from typing import Dict, List
+import argparse
+import datetime
+import os
+import random
+
+FIRST_NAMES = ['Alice', 'Bob', 'Carol', 'Dan', 'Erin', 'Frank', 'Grace',
+               'Heidi', 'Ivan', 'Judy', 'Mallory', 'Niaj', 'Olivia', 'Peggy',
+               'Rupert', 'Sybil', 'Trent', 'Victor', 'Walter', 'Yvonne']
+
+SYLLABLES = ['ba', 'ke', 'lo', 'mi', 'nu', 'ra', 'si', 'to', 'va', 'ze',
+             'dor', 'fen', 'gal', 'hart', 'lin', 'mor', 'pen', 'rick', 'sel',
+             'win']
+
+DIAGNOSES = ['Cold', 'Dengue Fever', 'Enteric Diseases from Animals',
+             'Chronic Disease Indicators', 'Enterovirus Infections',
+             'Enterobius vermicularis Infection', 'Influenza', 'Asthma',
+             'Hypertension', 'Migraine']
+
+PROGNOSES = ['excellent', 'good', 'poor', 'very poor']
+
+DRUGS = ['Advil', 'Acetaminophen', 'Amiodarone HCl', 'Docusate Sodium',
+         'Hydrochlorothiazide', 'Ipratropium Bromide MDI',
+         'Lansoprazole Oral Suspension', 'Levofloxacin', 'Lidocaine',
+         'Meperidine', 'Morphine Sulfate', 'Neostigmine', 'Propofol',
+         'Spironolactone', 'Sucralfate', 'sodium bicarb']
+
+# How often a scheduled doctor does not show up, and how often someone who
+# was not scheduled covers for them.
+SICK_RATE = 0.05
+COVER_RATE = 0.5
+
+# How often a visit asks for a followup, and how many days later at most.
+FOLLOWUP_RATE = 0.7
+FOLLOWUP_DAYS = 30
+
+
+def person_name(number: int) -> str:
+    """ Return a unique 'Firstname Lastname' for the person <number>.
+
+    >>> person_name(0)
+    'Alice Ba'
+    >>> person_name(21)
+    'Bob Ke'
+    >>> len({person_name(n) for n in range(10000)})
+    10000
+    """
+    number, first = divmod(number, len(FIRST_NAMES))
+    last = ''
+    while True:
+        number, syllable = divmod(number, len(SYLLABLES))
+        last += SYLLABLES[syllable]
+        if number == 0:
+            break
+        number -= 1
+    return '{} {}'.format(FIRST_NAMES[first], last.capitalize())
+
+
+def _format_date(date: datetime.date) -> str:
+    """ Return <date> in the form MM/DD/YYYY.
+    """
+    return '{:02d}/{:02d}/{:04d}'.format(date.month, date.day, date.year)
+
+
+def generate(path: str, patients: int = 100, doctors: int = 10,
+             doctors_per_day: int = 2, visits_per_day: int = 2,
+             start: datetime.date = datetime.date(1997, 1, 1),
+             end: datetime.date = datetime.date(1998, 1, 1),
+             seed: int = 148) -> None:
+    """ Write a hospital directory with <patients> patients and <doctors>
+    doctors, <doctors_per_day> of whom are scheduled each day from <start> up
+    to but not including <end>, seeing <visits_per_day> patients in all each
+    day, into the directory <path>.
+
+    The same arguments always write the same files.
+
+    >>> import tempfile, hospital, loaddata
+    >>> with tempfile.TemporaryDirectory() as temp_dir:
+    ...     generate(temp_dir, patients=50, doctors=8,
+    ...              end=datetime.date(1997, 3, 1))
+    ...     hosp = hospital.Hospital("123 Fake St.")
+    ...     loaddata.read_hospital(hosp, temp_dir + '/')
+    >>> len(hosp.doctors), len(hosp.patients), len(hosp.attendance)
+    (8, 50, 59)
+    >>> sum(len(visits) for visits in hosp.admissions.values())
+    118
+    """
+    rand = random.Random(seed)
+    os.makedirs(path, exist_ok=True)
+    doctor_ids = [99000000 + number for number in range(doctors)]
+    doctor_names = [person_name(number) for number in range(doctors)]
+    patient_ids = [44000000 + number for number in range(patients)]
+
+    with open(os.path.join(path, 'README'), 'w') as file:
+        file.write('A hospital with\n{} patients,\n{} doctors, with \n'
+                   '{} doctors working per day, \nduring range({}, {}).'
+                   .format(patients, doctors, doctors_per_day, start, end))
+
+    with open(os.path.join(path, 'doctors.csv'), 'w') as file:
+        for doctor_id, name in zip(doctor_ids, doctor_names):
+            file.write('{},{},{:.2f}\n'.format(
+                doctor_id, name, rand.uniform(400, 3000)))
+
+    with open(os.path.join(path, 'patients.csv'), 'w') as file:
+        for number, patient_id in enumerate(patient_ids):
+            file.write('{},{}\n'.format(patient_id,
+                                        person_name(doctors + number)))
+
+    schedules: Dict[int, List[str]] = {number: [] for number in range(doctors)}
+    with open(os.path.join(path, 'attendance.dat'), 'w') as attendance, \
+            open(os.path.join(path, 'admissions.csv'), 'w') as admissions:
+        day = start
+        while day < end:
+            date = _format_date(day)
+            scheduled = rand.sample(range(doctors),
+                                    min(doctors_per_day, doctors))
+            attended = []
+            for number in scheduled:
+                schedules[number].append(date)
+                if rand.random() >= SICK_RATE:
+                    attended.append(number)
+                elif rand.random() < COVER_RATE:
+                    cover = rand.randrange(doctors)
+                    if cover not in scheduled and cover not in attended:
+                        attended.append(cover)
+            attendance.write(','.join([date] + [doctor_names[number]
+                                                for number in attended]))
+            attendance.write('\n')
+
+            for _ in range(visits_per_day if attended else 0):
+                if rand.random() < FOLLOWUP_RATE:
+                    followup = _format_date(day + datetime.timedelta(
+                        rand.randint(1, FOLLOWUP_DAYS)))
+                else:
+                    followup = 'None'
+                admissions.write('{},{},{},{},{},{},{}\n'.format(
+                    date, doctor_ids[rand.choice(attended)],
+                    rand.choice(patient_ids), rand.choice(DIAGNOSES),
+                    rand.choice(PROGNOSES), rand.choice(DRUGS), followup))
+            day += datetime.timedelta(1)
+
+    with open(os.path.join(path, 'schedule.dat'), 'w') as file:
+        for number in range(doctors):
+            if schedules[number]:
+                file.write(doctor_names[number] + '\n')
+                for date in schedules[number]:
+                    file.write(date + '\n')
+                file.write('\n')
+
+
+def main() -> None:
+    """ Write the hospital directory described on the command line.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('directory')
+    parser.add_argument('--patients', type=int, default=100)
+    parser.add_argument('--doctors', type=int, default=10)
+    parser.add_argument('--doctors-per-day', type=int, default=2)
+    parser.add_argument('--visits-per-day', type=int, default=2)
+    parser.add_argument('--start', type=datetime.date.fromisoformat,
+                        default=datetime.date(1997, 1, 1))
+    parser.add_argument('--end', type=datetime.date.fromisoformat,
+                        default=datetime.date(1998, 1, 1))
+    parser.add_argument('--seed', type=int, default=148)
+    args = parser.parse_args()
+    generate(args.directory, args.patients, args.doctors,
+             args.doctors_per_day, args.visits_per_day, args.start, args.end,
+             args.seed)
+
+
+if __name__ == '__main__':
+    main()
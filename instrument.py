@@ -0,0 +1,186 @@
+"""
+Opt-in instrumentation of the Hospital queries and the loaddata loaders.
+
+While enabled, every call of an instrumented method or function records its
+wall time, and the visits or attendance rows it examined, under its
+qualified name, e.g. 'Hospital.reminders' or 'loaddata.load_admissions'.
+
+The queries that sqlstore.SQLHospital overrides are recorded separately, as
+e.g. 'SQLHospital.reminders'. Their rows are not counted, since SQLite
+examines them.
+
+Instrumentation works by wrapping the instrumented methods and functions in
+place when it is enabled, and unwrapping them when it is disabled, so that
+while it is disabled they run unchanged. The code being measured reports
+the rows it examines with scanned(), which only checks whether a call is
+being recorded when instrumentation is disabled.
+
+Calls may be recorded from several threads at once: each thread's rows
+are only counted against the calls that thread is running.
+
+Sample Usage
+============
+>>> import datetime, hospital, loaddata
+>>> enable()
+>>> hosp = hospital.Hospital("123 Fake St.")
+>>> loaddata.read_hospital(hosp, 'data/janonly/')
+>>> hosp.reminders(datetime.date(2017, 1, 1), 2)
+[Pid: 44524416]
+>>> stats = snapshot()
+>>> stats['Hospital.reminders']['calls'], stats['Hospital.reminders']['rows']
+(1, 1)
+>>> stats['loaddata.load_admissions']['rows']
+96
+>>> stats['Hospital.load_schedules']['calls']
+1
+>>> disable()
+>>> reset()
+>>> snapshot()
+{}
+"""
+
+from __future__ import annotations
+from typing import Callable, Dict, List, Tuple
+import functools
+import json
+import threading
+import time
+
+# The Hospital methods instrumented.
+HOSPITAL_QUERIES = ['reminders', 'reminders_for_range', 'patients_seen',
+                    'busiest_doctors', 'busiest_doctors_by_window',
+                    'visit_counts', 'patient_counts', 'patients_by_doctor',
+                    'coverage', 'sick_days', 'all_sick_days', 'all_coverage',
+                    'followup_compliance', 'attended_to', 'prescribed_rate',
+                    'prescription_rates', 'top_medications',
+                    'prescribed_patients', 'diagnosed_patients',
+                    'projected_expenses', 'actual_expenses',
+                    'expenses_by_doctor', 'expenses_by_month',
+                    'expense_variance', 'load_schedules']
+
+# The loaddata functions instrumented.
+LOADERS = ['load_doctors', 'load_patients', 'load_attendance',
+           'load_admissions', 'read_hospital', 'ingest_admissions',
+           'ingest_attendance', 'load_visit_store', 'import_hospital',
+           'import_admissions', 'load_mapped_patients', 'parse_schedules']
+
+# The statistics recorded so far, by qualified name, as [calls, seconds,
+# rows], changed only while holding _stats_lock.
+_stats: Dict[str, List] = {}
+_stats_lock = threading.Lock()
+
+# The row counts of the instrumented calls each thread is now running,
+# innermost last, in the attribute 'calls'.
+_active = threading.local()
+
+# The unwrapped methods and functions, with the object each came from, while
+# instrumentation is enabled.
+_originals: List[Tuple[object, str, Callable]] = []
+
+
+def enable() -> None:
+    """ Start recording statistics for the instrumented methods and functions.
+    Does nothing if recording has already started.
+    """
+    import hospital
+    import loaddata
+    import sqlstore
+
+    if _originals:
+        return
+    sql_queries = [name for name in HOSPITAL_QUERIES
+                   if name in vars(sqlstore.SQLHospital)]
+    for owner, prefix, names in [(hospital.Hospital, 'Hospital',
+                                  HOSPITAL_QUERIES),
+                                 (sqlstore.SQLHospital, 'SQLHospital',
+                                  sql_queries),
+                                 (loaddata, 'loaddata', LOADERS)]:
+        for name in names:
+            original = getattr(owner, name)
+            _originals.append((owner, name, original))
+            setattr(owner, name, _wrap(prefix + '.' + name, original))
+
+
+def disable() -> None:
+    """ Stop recording statistics, leaving those recorded so far.
+    """
+    while _originals:
+        owner, name, original = _originals.pop()
+        setattr(owner, name, original)
+
+
+def is_enabled() -> bool:
+    """ Return whether statistics are being recorded.
+    """
+    return bool(_originals)
+
+
+def _wrap(name: str, function: Callable) -> Callable:
+    """ Return <function> wrapped to record its statistics under <name>.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        rows = [0]
+        calls = _calls()
+        calls.append(rows)
+        began = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - began
+            calls.pop()
+            with _stats_lock:
+                stat = _stats.setdefault(name, [0, 0.0, 0])
+                stat[0] += 1
+                stat[1] += elapsed
+                stat[2] += rows[0]
+    return wrapper
+
+
+def _calls() -> List[List[int]]:
+    """ Return the row counts of the instrumented calls this thread is now
+    running, innermost last.
+    """
+    if not hasattr(_active, 'calls'):
+        _active.calls = []
+    return _active.calls
+
+
+def scanned(rows: int) -> None:
+    """ Record that <rows> visits or attendance rows were examined, against
+    every instrumented call this thread is now running.
+    """
+    calls = getattr(_active, 'calls', None)
+    if calls:
+        for counts in calls:
+            counts[0] += rows
+
+
+def snapshot() -> Dict[str, Dict[str, float]]:
+    """ Return the statistics recorded so far: for each qualified name, the
+    number of 'calls', the total 'seconds' they took, and the total 'rows'
+    they examined.
+    """
+    with _stats_lock:
+        return {name: {'calls': calls, 'seconds': seconds, 'rows': rows}
+                for name, (calls, seconds, rows) in _stats.items()}
+
+
+def reset() -> None:
+    """ Forget the statistics recorded so far.
+    """
+    with _stats_lock:
+        _stats.clear()
+
+
+def dump(file_name: str) -> None:
+    """ Write the statistics recorded so far, as returned by snapshot, to
+    <file_name> as JSON.
+    """
+    with open(file_name, 'w') as file:
+        json.dump(snapshot(), file, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -1,8 +1,63 @@
 from __future__ import annotations
-from typing import List, Tuple, TypeVar
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, \
+    TypeVar, TextIO
+from concurrent.futures import Executor
+from array import array
+from collections import OrderedDict
 import hospital
+import instrument
+import visitstore
 import csv
 import datetime
+import mmap
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+
+# How many characters the bulk admissions parser reads at a time.
+CHUNK_SIZE = 1 << 20
+
+# The files read_hospital loads from a hospital directory.
+HOSPITAL_FILES = ['doctors.csv', 'patients.csv', 'attendance.dat',
+                  'admissions.csv', 'schedule.dat']
+
+# The name of the snapshot read_hospital keeps in a hospital directory.
+SNAPSHOT_FILE = 'hospital.snapshot'
+
+# Bumped whenever the layout of a pickled Hospital changes, so that older
+# snapshots are rebuilt rather than loaded.
+SNAPSHOT_VERSION = 11
+
+# The tables of a hospital database. Dates are stored as their proleptic
+# Gregorian ordinals (datetime.date.toordinal), and rows keep the order they
+# were read in as their rowid.
+SQL_TABLES = """
+CREATE TABLE IF NOT EXISTS doctors (
+    id INTEGER NOT NULL, name TEXT NOT NULL, salary REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS patients (
+    id INTEGER NOT NULL, name TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS schedules (
+    name TEXT NOT NULL, date INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS attendance (
+    date INTEGER PRIMARY KEY, names TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS visits (
+    date INTEGER NOT NULL, doctor_id INTEGER NOT NULL,
+    patient_id INTEGER NOT NULL, diagnosis TEXT, prognosis TEXT,
+    prescribed TEXT, followup_date INTEGER);
+"""
+
+# The indexes of a hospital database, created after a bulk import.
+SQL_INDEXES = """
+CREATE INDEX IF NOT EXISTS visits_by_date ON visits (date);
+CREATE INDEX IF NOT EXISTS visits_by_doctor ON visits (doctor_id, date);
+CREATE INDEX IF NOT EXISTS visits_by_patient ON visits (patient_id, date);
+CREATE INDEX IF NOT EXISTS visits_by_followup ON visits (followup_date)
+    WHERE followup_date IS NOT NULL;
+CREATE INDEX IF NOT EXISTS visits_by_medication ON visits (prescribed, date);
+CREATE INDEX IF NOT EXISTS visits_by_diagnosis ON visits (diagnosis, date);
+"""
 
 
 def load_doctors(hosp: Hospital, file_name: str) -> None:
@@ -13,6 +68,18 @@ def load_doctors(hosp: Hospital, file_name: str) -> None:
         99064054,Brian Hazlett,1070.33
         id-number,First-name Last-name,salary-per-day
     """
+    doctors = parse_doctors(file_name)
+    instrument.scanned(len(doctors))
+    with hosp.writing():
+        for doc in doctors:
+            hosp.hire_doctor(doc)
+
+
+def parse_doctors(file_name: str) -> List[Doctor]:
+    """
+    Returns the doctors listed in <file_name>, in the format described in
+    load_doctors.
+    """
     # Name, ID, and salary
     doctors = list()
     with open(file_name, 'r') as file:
@@ -21,11 +88,9 @@ def load_doctors(hosp: Hospital, file_name: str) -> None:
             id_number = int(id_number)
             salary = float(salary)
 
-            new_doctor = hospital.Doctor(name, id_number, salary)
+            new_doctor = hospital.Doctor(sys.intern(name), id_number, salary)
             doctors.append(new_doctor)
-
-    for doc in doctors:
-        hosp.hire_doctor(doc)
+    return doctors
 
 
 def load_patients(hosp: Hospital, file_name: str) -> None:
@@ -36,18 +101,68 @@ def load_patients(hosp: Hospital, file_name: str) -> None:
         44276583,Amalia Box
         id-number,First-name Last-name
     """
+    patients = parse_patients(file_name)
+    instrument.scanned(len(patients))
+    with hosp.writing():
+        for pat in patients:
+            hosp.admit_patient(pat)
+
+
+def parse_patients(file_name: str) -> List[Patient]:
+    """
+    Returns the patients listed in <file_name>, in the format described in
+    load_patients.
+    """
     patients = list()
     with open(file_name, 'r') as file:
         csv_reader = csv.reader(file, delimiter=',')
         for row in csv_reader:
             patient_id, patient_name = row
-            patients.append(hospital.Patient(patient_name, int(patient_id)))
+            patients.append(hospital.Patient(sys.intern(patient_name),
+                                             int(patient_id)))
+    return patients
 
-    for pat in patients:
-        hosp.admit_patient(pat)
 
+def load_mapped_patients(hosp: Hospital, file_name: str,
+                         admissions_file: str,
+                         cache_size: int = 1024) -> AdmissionsMap:
+    """
+    Updates <hosp> patients attribute to include patients from <file_name>,
+    as load_patients does, but with their histories read from the admissions
+    file <admissions_file> only when they are first used, and returns the
+    AdmissionsMap they are read through. At most <cache_size> histories are
+    kept at a time.
+
+    This takes the place of load_admissions for looking up a few patients:
+    the admissions are not added to <hosp>, so its own admissions attribute
+    and the Hospital queries over admissions see none of them.
 
-def load_admissions(hosp: Hospital, file_name: str) -> None:
+    >>> eager = hospital.Hospital("123 Fake St.")
+    >>> read_hospital(eager, 'data/janonly/')
+    >>> lazy = hospital.Hospital("123 Fake St.")
+    >>> admissions = load_mapped_patients(lazy, 'data/janonly/patients.csv',
+    ...                                   'data/janonly/admissions.csv', 2)
+    >>> lazy.patients[3].missed_followups()
+    (4, 3)
+    >>> [patient.history for patient in lazy.patients] == \
+            [patient.history for patient in eager.patients]
+    True
+    >>> len(admissions)
+    2
+    >>> admissions.close()
+    """
+    admissions = AdmissionsMap(admissions_file, cache_size)
+    patients = parse_patients(file_name)
+    instrument.scanned(len(patients))
+    with hosp.writing():
+        for pat in patients:
+            hosp.admit_patient(hospital.MappedPatient(pat.name, pat.id,
+                                                      admissions))
+    return admissions
+
+
+def load_admissions(hosp: Hospital, file_name: str, bulk: bool = False,
+                    store: Optional[visitstore.VisitStore] = None) -> None:
     """
     Reads admissions data from <file_name> into Hospital <hosp>.
 
@@ -57,56 +172,578 @@ def load_admissions(hosp: Hospital, file_name: str) -> None:
         04/20/2017, 99722708, 44398694, Cold, poor, Advil, 04/29/2017
     or
         04/20/2017, 99722708, 44398694, Cold, poor, Advil, None
+
+    Repeated dates and strings are shared between visits rather than stored
+    once per row.
+
+    If <bulk> is True, the file is read in large chunks and rows are split
+    directly, falling back to the csv module only for rows that need it.
+
+    If a VisitStore <store> is given, the visits are appended to it as well,
+    so that it answers its queries over the same admissions as <hosp>.
+
+    >>> hosp = hospital.Hospital("123 Fake St.")
+    >>> read_hospital(hosp, 'data/year97/')
+    >>> store = visitstore.VisitStore()
+    >>> empty = hospital.Hospital("123 Fake St.")
+    >>> load_patients(empty, 'data/year97/patients.csv')
+    >>> load_admissions(empty, 'data/year97/admissions.csv', store=store)
+    >>> d1 = datetime.date(1997, 1, 1)
+    >>> d2 = datetime.date(1997, 2, 1)
+    >>> store.patient_counts(d1, d2) == {doctor_id: count for doctor_id, count
+    ...                                  in hosp.patient_counts(d1, d2).items()
+    ...                                  if count}
+    True
+    """
+    visits, offset = _read_admissions(file_name, bulk, 0, True)
+    instrument.scanned(len(visits))
+    with hosp.writing():
+        for hosp_visit in visits:
+            # Also links the visit into its patient's history.
+            hosp.record_visit(hosp_visit)
+        hosp.file_offsets[os.path.abspath(file_name)] = offset
+    if store is not None:
+        _store_visits(store, visits)
+
+
+def _store_visits(store: visitstore.VisitStore,
+                  visits: List[HospitalVisit]) -> None:
+    """
+    Appends <visits> to the columnar <store>.
+    """
+    for visit in visits:
+        store.append(visit.date, visit.doctor_id, visit.patient_id,
+                     visit.diagnosis, visit.prognosis, visit.prescribed,
+                     visit.followup_date)
+
+
+def ingest_admissions(hosp: Hospital, file_name: str,
+                      store: Optional[visitstore.VisitStore] = None) -> int:
+    """
+    Reads into <hosp> the visits appended to <file_name> since <hosp> last
+    loaded or ingested it, and returns how many there were.
+
+    Only whole lines are read; a last line that is still being written is
+    left for the next call. <file_name> is as for load_admissions.
+
+    Raises KeyError, recording none of the new visits, if any of them is by
+    a patient who is not admitted to <hosp>. If a VisitStore <store> is
+    given, the new visits are appended to it as well.
+
+    >>> import shutil, tempfile
+    >>> hosp = hospital.Hospital("123 Fake St.")
+    >>> hosp.load_doctors('data/janonly/doctors.csv')
+    >>> hosp.load_patients('data/janonly/patients.csv')
+    >>> with tempfile.TemporaryDirectory() as temp_dir:
+    ...     file_name = temp_dir + '/admissions.csv'
+    ...     _ = shutil.copy('data/janonly/admissions.csv', file_name)
+    ...     hosp.load_admissions(file_name)
+    ...     with open(file_name, 'a') as file:
+    ...         _ = file.write('01/30/2017,99591940,44524416,Cold,poor,'
+    ...                        'Advil,02/01/2017\\n01/31/2017,995')
+    ...     ingest_admissions(hosp, file_name)
+    ...     ingest_admissions(hosp, file_name)
+    ...     with open(file_name, 'a') as file:
+    ...         _ = file.write('591940,44524416,Cold,poor,Advil,None\\n'
+    ...                        '01/31/2017,99591940,148,Cold,poor,Advil,'
+    ...                        'None\\n')
+    ...     try:
+    ...         ingest_admissions(hosp, file_name)
+    ...     except KeyError as error:
+    ...         print('unknown patient', error)
+    1
+    0
+    unknown patient 148
+    >>> sum(len(visits) for visits in hosp.admissions.values())
+    97
+    >>> hosp.admissions[datetime.date(2017, 1, 30)][-1]
+    2017-01-30, 99591940, 44524416
+    """
+    key = os.path.abspath(file_name)
+    offset = hosp.file_offsets.get(key, 0)
+    if os.path.getsize(file_name) < offset:
+        raise ValueError('{} is shorter than when it was last read'
+                         .format(file_name))
+    visits, offset = _read_admissions(file_name, False, offset, False)
+    instrument.scanned(len(visits))
+    with hosp.writing():
+        for hosp_visit in visits:
+            if not hosp.has_patient(hosp_visit.patient_id):
+                raise KeyError(hosp_visit.patient_id)
+        for hosp_visit in visits:
+            hosp.record_visit(hosp_visit)
+        hosp.file_offsets[key] = offset
+    if store is not None:
+        _store_visits(store, visits)
+    return len(visits)
+
+
+def parse_admissions(file_name: str,
+                     bulk: bool = False) -> List[HospitalVisit]:
+    """
+    Returns the visits in <file_name>, in file order. <file_name> and <bulk>
+    are as for load_admissions.
+    """
+    return _read_admissions(file_name, bulk, 0, True)[0]
+
+
+def _read_admissions(file_name: str, bulk: bool, offset: int,
+                     partial: bool) -> Tuple[List[HospitalVisit], int]:
+    """
+    Returns the visits in <file_name> from byte <offset> on, and the offset
+    just past the last line read. <partial> is as for _FileTail.
+    """
+    visits = []
+    dates = {}
+    with open(file_name, 'rb') as file:
+        lines = _FileTail(file, offset, partial)
+        for row in _admission_rows(lines, bulk):
+            visits.append(hospital.HospitalVisit(*_parse_admission(row,
+                                                                   dates)))
+    return visits, lines.offset
+
+
+def iter_admissions(file_name: str,
+                    start_date: Optional[datetime.date] = None,
+                    end_date: Optional[datetime.date] = None,
+                    doctor_id: Optional[int] = None,
+                    bulk: bool = False) -> Iterator[HospitalVisit]:
+    """
+    Yields the visits in <file_name> one at a time, in file order, without
+    keeping them or adding them to a Hospital.
+
+    Only visits from <start_date> to <end_date> (inclusive) to the doctor
+    with id <doctor_id> are yielded; any of these left as None is not used as
+    a filter. Rows are filtered before a HospitalVisit is made for them.
+    <file_name> and <bulk> are as for load_admissions.
+
+    >>> visits = iter_admissions('data/year97/admissions.csv',
+    ...                          datetime.date(1997, 1, 1),
+    ...                          datetime.date(1997, 1, 31), 99991977)
+    >>> next(visits)
+    1997-01-07, 99991977, 44568820
+    >>> len(list(visits))
+    7
     """
+    dates = {}
     with open(file_name, 'r') as file:
-        csv_reader = csv.reader(file, delimiter=',')
-        for row in csv_reader:
-            # Sample:
-            # 04/20/2017, 99722708, 44398694, Cold, poor, Advil, 04/29/2017
-            intake, dr_id, patient_id, diagnosis = row[:4]
-            prognosis, prescribed, followup = row[4:]
-            intake = datetime.datetime.strptime(intake, '%m/%d/%Y').date()
-
-            if followup != "None":
-                followup = datetime.datetime.\
-                    strptime(followup, '%m/%d/%Y').date()
-            else:
-                followup = None
+        for row in _admission_rows(file, bulk):
+            if doctor_id is not None and int(row[1]) != doctor_id:
+                continue
+            if start_date is not None or end_date is not None:
+                intake = dates.get(row[0]) or _parse_date(row[0], dates)
+                if start_date is not None and intake < start_date or \
+                        end_date is not None and intake > end_date:
+                    continue
+            yield hospital.HospitalVisit(*_parse_admission(row, dates))
+
+
+def load_visit_store(file_name: str,
+                     store: visitstore.VisitStore = None,
+                     bulk: bool = False) -> visitstore.VisitStore:
+    """
+    Reads admissions data from <file_name> into a columnar VisitStore, without
+    creating a HospitalVisit for each row, and returns it.
 
-            hosp_visit = hospital.HospitalVisit(
-                intake,
-                int(dr_id),
-                int(patient_id),
-                diagnosis,
-                prognosis,
-                prescribed,
-                followup
-            )
+    The rows are added to <store> if one is given, or to a new VisitStore.
+    <file_name> and <bulk> are as for load_admissions.
+    """
+    if store is None:
+        store = visitstore.VisitStore()
+    before = len(store)
+    dates = {}
+    with open(file_name, 'r') as file:
+        for row in _admission_rows(file, bulk):
+            store.append(*_parse_admission(row, dates))
+    instrument.scanned(len(store) - before)
+    return store
 
-            hosp.admissions[intake].append(hosp_visit)
 
-    # Use admissions to load patient history.
-    id_to_object = {patient.id: patient for patient in hosp.patients}
+def _admission_rows(file: TextIO, bulk: bool) -> Iterator[List[str]]:
+    """
+    Yield the rows of the admissions csv <file>, in file order, skipping
+    blank lines.
+
+    With <bulk>, <file> is read CHUNK_SIZE characters at a time and each line
+    is split on commas; a line that is quoted or does not have seven fields
+    is handed to the csv module instead, so it is parsed (or rejected)
+    exactly as it would be without <bulk>.
+
+    >>> import io
+    >>> list(_admission_rows(io.StringIO('a,b\\n\\nc,d\\n'), False))
+    [['a', 'b'], ['c', 'd']]
+    >>> list(_admission_rows(io.StringIO('a,b\\n\\nc,d\\n'), True))
+    [['a', 'b'], ['c', 'd']]
+    """
+    if not bulk:
+        for row in csv.reader(file, delimiter=','):
+            if row:
+                yield row
+        return
+
+    rest = ''
+    chunk = file.read(CHUNK_SIZE)
+    while chunk:
+        lines = (rest + chunk).split('\n')
+        rest = lines.pop()
+        for line in lines:
+            row = line.split(',')
+            if len(row) != 7 or '"' in line:
+                row = next(csv.reader([line], delimiter=','))
+            if row:
+                yield row
+        chunk = file.read(CHUNK_SIZE)
+    if rest:
+        for row in csv.reader([rest], delimiter=','):
+            if row:
+                yield row
+
+
+def _parse_admission(row: List[str],
+                     dates: Dict[str, datetime.date]) -> tuple:
+    """
+    Return the HospitalVisit fields of one admissions.csv <row>:
+        intake, doctor id, patient id, diagnosis, prognosis, drug, followup
+
+    Every date is parsed once and then reused from <dates>, and every string
+    is interned, so that visits share them.
+    """
+    # Sample:
+    # 04/20/2017, 99722708, 44398694, Cold, poor, Advil, 04/29/2017
+    intake, dr_id, patient_id, diagnosis = row[:4]
+    prognosis, prescribed, followup = row[4:]
+    intake = dates.get(intake) or _parse_date(intake, dates)
 
-    for date in hosp.admissions.keys():  # for every day of year
-        for visit in hosp.admissions[date]:
-            id_to_object[visit.patient_id].history.append(visit)
+    if followup != "None":
+        followup = dates.get(followup) or _parse_date(followup, dates)
+    else:
+        followup = None
+
+    return (intake, int(dr_id), int(patient_id), sys.intern(diagnosis),
+            sys.intern(prognosis), sys.intern(prescribed), followup)
+
+
+def _parse_date(text: str, dates: Dict[str, datetime.date]) -> datetime.date:
+    """
+    Return the date written as MM/DD/YYYY in <text>, and remember it in
+    <dates>.
+
+    Dates in exactly that form are sliced apart rather than parsed with
+    strptime, which is only used for anything else, so that irregular dates
+    are accepted or rejected just as before.
+
+    >>> _parse_date('04/20/2017', {})
+    datetime.date(2017, 4, 20)
+    >>> _parse_date('4/2/2017', {})
+    datetime.date(2017, 4, 2)
+    >>> _parse_date('2017-04-20', {})
+    Traceback (most recent call last):
+    ...
+    ValueError: time data '2017-04-20' does not match format '%m/%d/%Y'
+    """
+    digits = text[0:2] + text[3:5] + text[6:]
+    if len(text) == 10 and text[2] == text[5] == '/' and \
+            digits.isascii() and digits.isdigit():
+        date = datetime.date(int(text[6:]), int(text[0:2]), int(text[3:5]))
+    else:
+        date = datetime.datetime.strptime(text, '%m/%d/%Y').date()
+    dates[text] = date
+    return date
 
 
 def load_attendance(hosp: Hospital, file_name: str) -> None:
     """
     Reads the attendance record into <hosp> from <file_name>.
     """
-    with open(file_name, 'r') as file:
+    days, offset = _read_attendance(file_name, 0, True)
+    instrument.scanned(len(days))
+    with hosp.writing():
+        for date, doctors in days:
+            hosp.record_attendance(date, doctors)
+        hosp.file_offsets[os.path.abspath(file_name)] = offset
+
+
+def ingest_attendance(hosp: Hospital, file_name: str) -> int:
+    """
+    Reads into <hosp> the days appended to the attendance record <file_name>
+    since <hosp> last loaded or ingested it, and returns how many there were.
+
+    Only whole lines are read; a last line that is still being written is
+    left for the next call.
+    """
+    key = os.path.abspath(file_name)
+    offset = hosp.file_offsets.get(key, 0)
+    if os.path.getsize(file_name) < offset:
+        raise ValueError('{} is shorter than when it was last read'
+                         .format(file_name))
+    days, offset = _read_attendance(file_name, offset, False)
+    instrument.scanned(len(days))
+    with hosp.writing():
+        for date, doctors in days:
+            hosp.record_attendance(date, doctors)
+        hosp.file_offsets[key] = offset
+    return len(days)
+
+
+def parse_attendance(file_name: str) -> List[Tuple[datetime.date, List[str]]]:
+    """
+    Returns the days of the attendance record <file_name>, in file order, each
+    with the names of the doctors who attended that day.
+    """
+    return _read_attendance(file_name, 0, True)[0]
+
+
+def _read_attendance(file_name: str, offset: int, partial: bool) \
+        -> Tuple[List[Tuple[datetime.date, List[str]]], int]:
+    """
+    Returns the days of the attendance record <file_name> from byte <offset>
+    on, and the offset just past the last line read. <partial> is as for
+    _FileTail.
+    """
+    days = []
+    with open(file_name, 'rb') as file:
+        lines = _FileTail(file, offset, partial)
         # File looks like: MO/DA/YEAR,Doctor Name,Doctor Name,...
-        for line in file:
-            line = line[:-1].split(",")  # remove a newline
+        for line in lines:
+            line = line.rstrip('\n')
+            if not line:
+                continue
+            line = line.split(",")
             month, day, year = map(int, line[0].split("/"))
-            doctors = line[1:]
-            hosp.attendance[datetime.date(year, month, day)] = doctors
+            doctors = [sys.intern(name) for name in line[1:]]
+            days.append((datetime.date(year, month, day), doctors))
+    return days, lines.offset
 
 
-def read_hospital(hosp: Hospital, path: str) -> None:
+class _FileTail:
+    """
+    A text view of a binary file from a byte offset on, for reading files
+    that are still being appended to.
+
+    Only whole lines are read, so a line that is still being written is left
+    for the next reader, unless <partial> is True, in which case an
+    unterminated last line is read as well.
+
+    Public Attributes
+    =================
+    offset: The byte offset just past the text read so far.
+    """
+
+    offset: int
+    _file: BinaryIO
+    _partial: bool
+    _pending: bytes
+
+    def __init__(self, file: BinaryIO, offset: int, partial: bool) -> None:
+        """
+        Initialize this _FileTail on <file>, starting at byte <offset>.
+        """
+        file.seek(offset)
+        self.offset = offset
+        self._file = file
+        self._partial = partial
+        self._pending = b''
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Yield each line, with its newline.
+        """
+        for line in self._file:
+            if not line.endswith(b'\n') and not self._partial:
+                return
+            self.offset += len(line)
+            yield _decode(line)
+
+    def read(self, size: int) -> str:
+        """
+        Return the whole lines within about the next <size> bytes, or '' at
+        the end.
+        """
+        while True:
+            data = self._pending + self._file.read(size)
+            end = data.rfind(b'\n') + 1
+            if end == 0 and len(data) == len(self._pending):
+                # Nothing more to read.
+                end = len(data) if self._partial else 0
+                self._pending = b''
+                self.offset += end
+                return _decode(data[:end])
+            self._pending = data[end:]
+            if end:
+                self.offset += end
+                return _decode(data[:end])
+
+
+class AdmissionsMap:
+    """
+    The visits of an admissions file, by patient, parsed only when a
+    patient's visits are asked for.
+
+    The file is memory-mapped and scanned once for the byte offset of each
+    row, by patient id. The visits of a patient are parsed from their rows
+    when they are asked for, and the lists of visits of the patients most
+    recently asked for are kept, up to a limit.
+
+    Public Attributes
+    =================
+    file_name: The admissions file.
+    cache_size: The most patients whose visits are kept at a time.
+
+    Private Attributes
+    ==================
+    _file: The open admissions file.
+    _map: The memory map of the admissions file, or None if it is empty.
+    _offsets: The byte offsets of the rows of each patient, by patient id, in
+        file order.
+    _histories: The visits of the patients most recently asked for, by
+        patient id, least recently asked for first.
+    _dates: The dates parsed so far, by their text, as for _parse_admission.
+    _lock: Held while the kept visits are looked up or changed, since the
+        patients of a Hospital may be read from several threads at once.
+
+    Sample Usage
+    ============
+    >>> admissions = AdmissionsMap('data/year97/admissions.csv', 10)
+    >>> admissions.history(44568820)[0]
+    1997-08-12, 99145586, 44568820
+    >>> admissions.history(148)
+    []
+    >>> admissions.close()
+    """
+
+    file_name: str
+    cache_size: int
+    _file: BinaryIO
+    _map: Optional[mmap.mmap]
+    _offsets: Dict[int, array]
+    _histories: OrderedDict
+    _dates: Dict[str, datetime.date]
+    _lock: threading.Lock
+
+    def __init__(self, file_name: str, cache_size: int = 1024) -> None:
+        """
+        Initialize this AdmissionsMap on the admissions file <file_name>,
+        keeping the visits of up to <cache_size> patients at a time.
+        """
+        self.file_name = file_name
+        self.cache_size = cache_size
+        self._file = open(file_name, 'rb')
+        self._offsets = {}
+        self._histories = OrderedDict()
+        self._dates = {}
+        self._lock = threading.Lock()
+        if os.path.getsize(file_name) == 0:
+            self._map = None
+            return
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        data = self._map
+        position = 0
+        while position < len(data):
+            end = data.find(b'\n', position)
+            if end < 0:
+                end = len(data)
+            if data[position:end].strip():
+                # File looks like: MM/DD/YYYY,doctor id,patient id,...
+                patient_id = int(data[position:end].split(b',', 3)[2])
+                if patient_id not in self._offsets:
+                    self._offsets[patient_id] = array('q')
+                self._offsets[patient_id].append(position)
+            position = end + 1
+        instrument.scanned(sum(map(len, self._offsets.values())))
+
+    def __len__(self) -> int:
+        """
+        Return the number of patients whose visits are kept.
+        """
+        return len(self._histories)
+
+    def history(self, patient_id: int) -> List[HospitalVisit]:
+        """
+        Return the visits of the patient with id <patient_id>, in file order,
+        parsing them if they are not kept.
+        """
+        with self._lock:
+            if patient_id in self._histories:
+                self._histories.move_to_end(patient_id)
+                return self._histories[patient_id]
+            visits = []
+            for position in self._offsets.get(patient_id, []):
+                end = self._map.find(b'\n', position)
+                line = _decode(self._map[position:len(self._map) if end < 0
+                                         else end + 1])
+                row = next(csv.reader([line], delimiter=','))
+                visits.append(hospital.HospitalVisit(
+                    *_parse_admission(row, self._dates)))
+            instrument.scanned(len(visits))
+            self._keep(patient_id, visits)
+            return visits
+
+    def set_history(self, patient_id: int,
+                    visits: List[HospitalVisit]) -> None:
+        """
+        Keep <visits> as the visits of the patient with id <patient_id>, until
+        they are dropped to make room for other patients.
+        """
+        with self._lock:
+            self._keep(patient_id, visits)
+
+    def _keep(self, patient_id: int, visits: List[HospitalVisit]) -> None:
+        """
+        Keep <visits> as set_history does, with self._lock already held.
+        """
+        self._histories[patient_id] = visits
+        self._histories.move_to_end(patient_id)
+        while len(self._histories) > max(self.cache_size, 1):
+            self._histories.popitem(last=False)
+
+    def close(self) -> None:
+        """
+        Close the admissions file. Visits kept so far can still be asked for.
+        """
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+def _decode(data: bytes) -> str:
+    """
+    Return <data> as text, with Windows line endings turned into newlines as
+    a file opened in text mode would.
+    """
+    return data.decode().replace('\r\n', '\n')
+
+
+def parse_schedules(file_name: str) \
+        -> List[Tuple[str, List[datetime.date]]]:
+    """
+    Returns the schedules in <file_name>, in file order, as pairs of a doctor
+    name and the dates that doctor is scheduled to work.
+
+    The format of <file_name> is described in Hospital.load_schedules.
+    """
+    schedules = []
+    with open(file_name, 'r') as file:
+        dates = None
+        for line in file:
+            line = line.rstrip('\n')
+            if dates is None:
+                if not line:
+                    continue  # Extra blank lines between doctors.
+                dates = []
+                schedules.append((line, dates))
+            elif line:
+                dates.append(datetime.date(int(line[6:]), int(line[0:2]),
+                                           int(line[3:5])))
+            else:
+                dates = None
+    instrument.scanned(sum(len(dates) for _, dates in schedules))
+    return schedules
+
+
+def read_hospital(hosp: Hospital, path: str,
+                  executor: Optional[Executor] = None,
+                  snapshot: bool = False) -> None:
     """
     Updates <hosp> in place from files inside a <path> containing
         1/  admissions.csv
@@ -115,7 +752,57 @@ def read_hospital(hosp: Hospital, path: str) -> None:
         4/  patients.csv
         5/  schedule.dat
     with the appropriate data formatting.
+
+    If an <executor> such as a ThreadPoolExecutor or ProcessPoolExecutor is
+    given, the five files are parsed concurrently in it, and then linked into
+    <hosp> in the same order as when they are loaded one after another. Either
+    way <hosp> ends up in the same state.
+
+    If <snapshot> is True and <hosp> is empty, <hosp> is loaded from the
+    snapshot SNAPSHOT_FILE in <path> when none of the five files has changed
+    size or modification time since it was written. Otherwise the files are
+    parsed and the snapshot is written again for the next reader.
+
+    Snapshots are opt-in rather than the default for two reasons. They are
+    pickles, and loading one runs whatever code it names, so they should
+    only be read from directories whose writers are trusted. Also, writing
+    one puts a file into the data directory, which callers reading shared
+    or checked-in data may not expect.
+
+    >>> from concurrent.futures import ProcessPoolExecutor
+    >>> serial = hospital.Hospital("123 Fake St.")
+    >>> read_hospital(serial, 'data/year97/')
+    >>> parallel = hospital.Hospital("123 Fake St.")
+    >>> with ProcessPoolExecutor() as pool:
+    ...     read_hospital(parallel, 'data/year97/', pool)
+    >>> parallel.doctors == serial.doctors
+    True
+    >>> [doc.schedule for doc in parallel.doctors] == \
+            [doc.schedule for doc in serial.doctors]
+    True
+    >>> [pat.history for pat in parallel.patients] == \
+            [pat.history for pat in serial.patients]
+    True
+    >>> parallel.attendance == serial.attendance
+    True
+    >>> parallel.admissions == serial.admissions
+    True
     """
+    if snapshot and _is_empty(hosp):
+        snapshot_file = path + SNAPSHOT_FILE
+        if load_snapshot(hosp, snapshot_file, path):
+            return
+        stamps = _file_stamps(path)
+        read_hospital(hosp, path, executor)
+        try:
+            save_snapshot(hosp, snapshot_file, path, stamps)
+        except OSError:
+            pass  # A read-only directory only costs the next reader a parse.
+        return
+
+    if executor is not None:
+        _read_hospital_parallel(hosp, path, executor)
+        return
 
     # load and setup doctors (with empty schedule)
     hosp.load_doctors(path + 'doctors.csv')
@@ -127,3 +814,219 @@ def read_hospital(hosp: Hospital, path: str) -> None:
     hosp.load_attendance(path + 'attendance.dat')
     hosp.load_admissions(path + 'admissions.csv')
     hosp.load_schedules(path + 'schedule.dat')
+
+
+def _read_hospital_parallel(hosp: Hospital, path: str,
+                            executor: Executor) -> None:
+    """
+    Updates <hosp> as read_hospital does, parsing the files concurrently in
+    <executor>.
+    """
+    doctors = executor.submit(parse_doctors, path + 'doctors.csv')
+    patients = executor.submit(parse_patients, path + 'patients.csv')
+    attendance = executor.submit(_read_attendance, path + 'attendance.dat',
+                                 0, True)
+    admissions = executor.submit(_read_admissions, path + 'admissions.csv',
+                                 False, 0, True)
+    schedules = executor.submit(parse_schedules, path + 'schedule.dat')
+
+    # Linking must still be done in the serial order: visits need their
+    # patients, and schedules need their doctors.
+    doctors, patients = doctors.result(), patients.result()
+    days, attendance_offset = attendance.result()
+    visits, admissions_offset = admissions.result()
+    schedules = schedules.result()
+    with hosp.writing():
+        for doc in doctors:
+            hosp.hire_doctor(doc)
+        for pat in patients:
+            hosp.admit_patient(pat)
+        for date, names in days:
+            hosp.record_attendance(date, names)
+        hosp.file_offsets[os.path.abspath(path + 'attendance.dat')] = \
+            attendance_offset
+        for visit in visits:
+            hosp.record_visit(visit)
+        hosp.file_offsets[os.path.abspath(path + 'admissions.csv')] = \
+            admissions_offset
+        hosp.set_schedules(schedules)
+
+
+def save_snapshot(hosp: Hospital, file_name: str, path: str,
+                  stamps: Optional[List[Tuple[str, int, int]]] = None) \
+        -> None:
+    """
+    Writes all of <hosp>, including its indexes, to the binary snapshot
+    <file_name>, stamped with the size and modification time of the hospital
+    files in <path> it was loaded from.
+
+    <stamps> are those files' stamps, as returned by _file_stamps, taken
+    before <hosp> was read from them. If a file grows while it is being
+    read, the snapshot is then already out of date and will not be loaded.
+    If <stamps> is None the stamps are taken now.
+
+    The snapshot is written to a temporary file first and then moved into
+    place, so a concurrent reader never sees half a snapshot.
+    """
+    if stamps is None:
+        stamps = _file_stamps(path)
+    contents = (SNAPSHOT_VERSION, stamps, hosp.__dict__)
+    temp_name = '{}.{}.tmp'.format(file_name, os.getpid())
+    try:
+        with open(temp_name, 'wb') as file, hosp.reading():
+            pickle.dump(contents, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_name, file_name)
+    finally:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+
+
+def load_snapshot(hosp: Hospital, file_name: str, path: str) -> bool:
+    """
+    Loads <hosp> from the snapshot <file_name> written by save_snapshot, and
+    returns True, if the hospital files in <path> are unchanged since then.
+
+    Returns False, leaving <hosp> as it was, if there is no such snapshot, it
+    is from an older version of this code, or any of the files in <path> has
+    changed. <hosp> keeps its own address, and its own query cache and cache
+    size.
+
+    Snapshots are pickles, so only load ones this code wrote itself.
+
+    >>> import tempfile
+    >>> hosp = hospital.Hospital("123 Fake St.")
+    >>> read_hospital(hosp, 'data/janonly/')
+    >>> with tempfile.TemporaryDirectory() as temp_dir:
+    ...     save_snapshot(hosp, temp_dir + '/hosp.snapshot', 'data/janonly/')
+    ...     copy = hospital.Hospital("456 Real Ave.", 500)
+    ...     load_snapshot(copy, temp_dir + '/hosp.snapshot', 'data/janonly/')
+    True
+    >>> copy
+    Hospital on 456 Real Ave.
+    >>> copy.cache_info()['maxsize']
+    500
+    >>> copy.patients == hosp.patients
+    True
+    >>> round(copy.actual_expenses(), 2)
+    48502.41
+    >>> sorted(copy.reminders(datetime.date(2017, 1, 1), 2))
+    [Pid: 44524416]
+    """
+    try:
+        with open(file_name, 'rb') as file:
+            version, stamps, state = pickle.load(file)
+    except (OSError, EOFError, ValueError, AttributeError, ImportError,
+            pickle.UnpicklingError):
+        return False
+    if version != SNAPSHOT_VERSION or stamps != _file_stamps(path):
+        return False
+    # <hosp> keeps its own lock, which other threads may be waiting on.
+    del state['_lock']
+    del state['address']
+    del state['_cache']
+    with hosp.writing():
+        hosp.__dict__.update(state)
+        hosp.clear_cache()
+    return True
+
+
+def _file_stamps(path: str) -> List[Tuple[str, int, int]]:
+    """
+    Returns the name, size and modification time of each hospital file in
+    <path>, for telling whether a snapshot of it is still current.
+    """
+    stamps = []
+    for name in HOSPITAL_FILES:
+        stat = os.stat(path + name)
+        stamps.append((name, stat.st_size, stat.st_mtime_ns))
+    return stamps
+
+
+def _is_empty(hosp: Hospital) -> bool:
+    """
+    Returns whether nothing has been loaded into <hosp> yet.
+    """
+    return not (hosp.doctors or hosp.patients or hosp.attendance or
+                hosp.admissions or hosp.file_offsets)
+
+
+def connect_database(db_name: str) -> sqlite3.Connection:
+    """
+    Returns a connection to the hospital database <db_name>, creating the file
+    and its tables and indexes if they do not exist yet.
+    """
+    db = sqlite3.connect(db_name)
+    db.executescript(SQL_TABLES + SQL_INDEXES)
+    return db
+
+
+def import_hospital(path: str, db_name: str, bulk: bool = False) -> None:
+    """
+    Imports the five files of the hospital directory <path>, as read by
+    read_hospital, into the hospital database <db_name>, creating it if need
+    be. The indexes are built once all the rows are in. <bulk> is as for
+    load_admissions.
+
+    As with read_hospital, the rows are added to any already in the database,
+    except that the schedules replace those there.
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as temp_dir:
+    ...     import_hospital('data/janonly/', temp_dir + '/hospital.db')
+    ...     db = connect_database(temp_dir + '/hospital.db')
+    ...     db.execute('SELECT COUNT(*) FROM visits').fetchone()
+    ...     db.close()
+    (96,)
+    """
+    db = sqlite3.connect(db_name)
+    try:
+        db.executescript(SQL_TABLES)
+        db.executemany('INSERT INTO doctors VALUES (?, ?, ?)',
+                       [(doctor.id, doctor.name, doctor.salary)
+                        for doctor in parse_doctors(path + 'doctors.csv')])
+        db.executemany('INSERT INTO patients VALUES (?, ?)',
+                       [(patient.id, patient.name) for patient
+                        in parse_patients(path + 'patients.csv')])
+        db.executemany('INSERT OR REPLACE INTO attendance VALUES (?, ?)',
+                       [(date.toordinal(), ','.join(names)) for date, names
+                        in parse_attendance(path + 'attendance.dat')])
+        import_admissions(db, path + 'admissions.csv', bulk)
+        db.execute('DELETE FROM schedules')
+        db.executemany('INSERT INTO schedules VALUES (?, ?)',
+                       [(name, date.toordinal()) for name, dates
+                        in parse_schedules(path + 'schedule.dat')
+                        for date in dates])
+        db.executescript(SQL_INDEXES)
+        db.commit()
+    finally:
+        db.close()
+
+
+def import_admissions(db: sqlite3.Connection, file_name: str,
+                      bulk: bool = False) -> int:
+    """
+    Inserts the visits of the admissions file <file_name> into the visits
+    table of the hospital database <db>, without making a HospitalVisit for
+    each, and returns how many there were. <bulk> is as for load_admissions.
+
+    The rows are not committed.
+    """
+    before = db.total_changes
+    dates = {}
+    with open(file_name, 'r') as file:
+        db.executemany('INSERT INTO visits VALUES (?, ?, ?, ?, ?, ?, ?)',
+                       (_visit_row(_parse_admission(row, dates))
+                        for row in _admission_rows(file, bulk)))
+    instrument.scanned(db.total_changes - before)
+    return db.total_changes - before
+
+
+def _visit_row(fields: tuple) -> tuple:
+    """
+    Returns the HospitalVisit <fields> as a row of the visits table, with the
+    dates as ordinals.
+    """
+    intake, doctor_id, patient_id, diagnosis, prognosis, prescribed, \
+        followup = fields
+    return (intake.toordinal(), doctor_id, patient_id, diagnosis, prognosis,
+            prescribed, None if followup is None else followup.toordinal())
@@ -0,0 +1,189 @@
+from __future__ import annotations
+from typing import Any, Callable, List
+from concurrent.futures import ProcessPoolExecutor
+import datetime
+import hospital
+import loaddata
+
+# The Hospital loaded into this worker process, when it serves a shard.
+_shard = None
+
+
+def _load_shard(path: str, snapshot: bool) -> None:
+    """
+    Load the hospital directory <path> into this worker process's shard.
+    """
+    global _shard
+    _shard = hospital.Hospital(path)
+    loaddata.read_hospital(_shard, path, snapshot=snapshot)
+
+
+def _shard_query(method: str, *args: Any) -> Any:
+    """
+    Return the result of calling the Hospital method named <method> on this
+    worker process's shard with <args>.
+    """
+    return getattr(_shard, method)(*args)
+
+
+def _shard_ready() -> bool:
+    """
+    Return whether this worker process's shard has been loaded.
+    """
+    return _shard is not None
+
+
+def _shard_doctors() -> List[hospital.Doctor]:
+    """
+    Return the doctors of this worker process's shard.
+    """
+    return _shard.doctors
+
+
+def _shard_reminders(date: datetime.date,
+                     delta: int) -> List[hospital.Patient]:
+    """
+    Return the patients of this worker process's shard that are due a
+    reminder, as by Hospital.reminders, without their visit histories.
+    """
+    return [hospital.Patient(patient.name, patient.id)
+            for patient in _shard.reminders(date, delta)]
+
+
+class HospitalNetwork:
+    """ A network of hospitals, for example one per site and year, that is
+    queried as a whole.
+
+    Each hospital directory is loaded into its own Hospital shard, which
+    lives in a worker process of its own, so that loading and queries run on
+    all the shards at the same time. Results are merged by doctor and patient
+    id, so a doctor or patient who appears in several shards is counted once.
+
+    Doctors and patients in the merged results are copies sent back from the
+    worker processes; patients come back without their visit histories.
+
+    Public Attributes
+    =================
+    paths: The hospital directories in this network, one per shard.
+
+    Sample Usage
+    ============
+    >>> with HospitalNetwork(['data/janonly/', 'data/year97/']) as network:
+    ...     round(network.actual_expenses(), 2)
+    ...     round(network.projected_expenses(), 2)
+    ...     sorted(network.busiest_doctors(datetime.date(1997, 1, 1),
+    ...                                    datetime.date(1997, 2, 1)))
+    1397703.87
+    1415322.93
+    [Did: 99298240, Did: 99817905]
+    """
+
+    paths: List[str]
+    _shards: List[ProcessPoolExecutor]
+
+    def __init__(self, paths: List[str], snapshot: bool = False) -> None:
+        """ Load a shard for each hospital directory in <paths>, at the same
+        time, using the snapshot in each directory if <snapshot> is True (see
+        loaddata.read_hospital).
+        """
+        self.paths = list(paths)
+        self._shards = [ProcessPoolExecutor(max_workers=1,
+                                            initializer=_load_shard,
+                                            initargs=(path, snapshot))
+                        for path in self.paths]
+        # Start every worker now rather than on the first query.
+        self._fan_out(_shard_ready)
+
+    def __enter__(self) -> HospitalNetwork:
+        """ Return this network, for use in a with statement.
+        """
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """ Shut this network down at the end of a with statement.
+        """
+        self.close()
+
+    def close(self) -> None:
+        """ Stop the worker processes of this network.
+        """
+        for shard in self._shards:
+            shard.shutdown()
+
+    def _fan_out(self, function: Callable, *args: Any) -> List[Any]:
+        """ Return the results of calling <function> with <args> in the worker
+        process of each shard, in the order of self.paths.
+        """
+        futures = [shard.submit(function, *args) for shard in self._shards]
+        return [future.result() for future in futures]
+
+    def query(self, method: str, *args: Any) -> List[Any]:
+        """ Return the result of calling the Hospital method named <method>
+        with <args> on each shard, in the order of self.paths.
+
+        >>> with HospitalNetwork(['data/janonly/', 'data/year97/']) as network:
+        ...     [round(total, 2) for total in network.query('actual_expenses')]
+        [48502.41, 1349201.46]
+        """
+        return self._fan_out(_shard_query, method, *args)
+
+    def projected_expenses(self) -> float:
+        """ Return the total expenses projected from the doctor schedules of
+        every hospital in this network. See Hospital.projected_expenses.
+        """
+        return sum(self.query('projected_expenses'))
+
+    def actual_expenses(self) -> float:
+        """ Return the total cost of every shift worked at any hospital in this
+        network. See Hospital.actual_expenses.
+        """
+        return sum(self.query('actual_expenses'))
+
+    def busiest_doctors(self, start_date: datetime.date,
+                        end_date: datetime.date) -> List[hospital.Doctor]:
+        """ Return the doctors (in any order) who were busiest from
+        <start_date> to <end_date> inclusive across all the hospitals in this
+        network. See Hospital.busiest_doctors.
+
+        A doctor who works at several hospitals is ranked on their unique
+        patients at all of them together, so a patient they saw at more than
+        one is counted once.
+        """
+        doctors = {}
+        for shard_doctors in self._fan_out(_shard_doctors):
+            for doctor in shard_doctors:
+                doctors.setdefault(doctor.id, doctor)
+
+        patients = {doctor_id: set() for doctor_id in doctors}
+        for shard_patients in self.query('patients_by_doctor', start_date,
+                                         end_date):
+            for doctor_id in shard_patients:
+                if doctor_id in patients:
+                    patients[doctor_id].update(shard_patients[doctor_id])
+        counts = {doctor_id: len(patients[doctor_id])
+                  for doctor_id in patients}
+
+        high = max(counts.values(), default=0)
+        return [doctors[doctor_id] for doctor_id in counts
+                if counts[doctor_id] == high]
+
+    def reminders(self, date: datetime.date,
+                  delta: int) -> List[hospital.Patient]:
+        """ Return the patients of any hospital in this network that have
+        follow-up days scheduled within <delta>-days of <date>, each listed
+        once. See Hospital.reminders.
+
+        >>> with HospitalNetwork(['data/janonly/', 'data/year97/']) as network:
+        ...     len(network.reminders(datetime.date(1997, 10, 17), 3))
+        10
+        """
+        patients = {}
+        for shard_patients in self._fan_out(_shard_reminders, date, delta):
+            for patient in shard_patients:
+                patients.setdefault(patient.id, patient)
+        return list(patients.values())
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,485 @@
+"""
+A Hospital whose visits are kept in a SQLite database rather than in memory,
+for hospitals with more admissions than fit in memory.
+
+A hospital directory is imported into a database file once, with
+loaddata.import_hospital, and then opened as an SQLHospital. Doctors,
+schedules, attendance and patients are read into memory, since they are
+small next to the visits. The visits stay in the database: the queries that
+read them are answered in SQL, using the database's indexes, and a patient's
+history is only read when it is first used.
+
+Sample Usage
+============
+>>> import tempfile
+>>> hosp = hospital.Hospital("123 Fake St.")
+>>> loaddata.read_hospital(hosp, 'data/year97/')
+>>> temp_dir = tempfile.TemporaryDirectory()
+>>> loaddata.import_hospital('data/year97/', temp_dir.name + '/hospital.db')
+>>> stored = SQLHospital("123 Fake St.", temp_dir.name + '/hospital.db')
+>>> d1 = datetime.date(1997, 1, 1)
+>>> d2 = datetime.date(1997, 2, 1)
+>>> sorted(stored.busiest_doctors(d1, d2))
+[Did: 99298240, Did: 99817905]
+>>> round(stored.actual_expenses(), 2)
+1349201.46
+>>> stored.patients_seen(stored.doctors[2], d1, d2)
+8
+>>> sorted(stored.reminders(datetime.date(1997, 10, 17), 3)) == \
+        sorted(hosp.reminders(datetime.date(1997, 10, 17), 3))
+True
+>>> stored.patients[66].missed_followups()
+(12, 1)
+>>> stored.followup_compliance() == hosp.followup_compliance()
+True
+>>> stored.prescription_rates() == hosp.prescription_rates()
+True
+>>> stored.top_medications(3, start_date=d1, end_date=d2) == \
+        hosp.top_medications(3, start_date=d1, end_date=d2)
+True
+>>> stored.prescribed_patients("Propofol") == \
+        hosp.prescribed_patients("Propofol")
+True
+>>> stored.busiest_doctors_by_window(d1, d2, 7, 3) == \
+        hosp.busiest_doctors_by_window(d1, d2, 7, 3)
+True
+>>> stored.close()
+>>> temp_dir.cleanup()
+"""
+
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Set, Tuple
+import datetime
+import os
+import sqlite3
+import hospital
+import loaddata
+
+# The ordinals stood in for an open end of a date range.
+FIRST_DAY = datetime.date.min.toordinal()
+LAST_DAY = datetime.date.max.toordinal()
+
+
+def _ordinal(date: Optional[datetime.date], default: int) -> int:
+    """ Return the ordinal of <date>, or <default> if it is None.
+    """
+    return default if date is None else date.toordinal()
+
+
+def _visit(row: tuple) -> hospital.HospitalVisit:
+    """ Return the HospitalVisit stored in the visits table <row>.
+    """
+    date, doctor_id, patient_id, diagnosis, prognosis, prescribed, \
+        followup = row
+    return hospital.HospitalVisit(
+        datetime.date.fromordinal(date), doctor_id, patient_id, diagnosis,
+        prognosis, prescribed,
+        None if followup is None else datetime.date.fromordinal(followup))
+
+
+class StoredPatient(hospital.Patient):
+    """A patient of an SQLHospital, whose history is read from the hospital
+    database the first time it is used.
+
+    Private Attributes
+    ==================
+    _db: The hospital database this patient's visits are kept in.
+    """
+
+    __slots__ = ('_db',)
+
+    _db: sqlite3.Connection
+
+    def __init__(self, name: str, id_num: int,
+                 db: sqlite3.Connection) -> None:
+        """ Initialize this StoredPatient with name <name> and identification
+        number <id_num>, and its visits in the hospital database <db>.
+        """
+        hospital.Patient.__init__(self, name, id_num)
+        self._db = db
+        self._history = None
+
+    def _load_history(self) -> List[hospital.HospitalVisit]:
+        """ Return the visits of this patient from the hospital database, in
+        the order they were recorded.
+        """
+        return [_visit(row) for row in self._db.execute(
+            'SELECT * FROM visits WHERE patient_id = ? ORDER BY rowid',
+            (self.id,))]
+
+    def _forget_history(self) -> None:
+        """ Drop the visits of this patient read so far, so that they are read
+        again, with any recorded since, the next time they are used.
+        """
+        self._history = None
+
+
+class SQLHospital(hospital.Hospital):
+    """ A Hospital whose visits are kept in a SQLite database.
+
+    Every change made through the Hospital methods is written to the
+    database, and is saved to its file when commit or close is called.
+    self.admissions is not used: visits are only in the database. An
+    SQLHospital cannot be pickled, so it cannot be kept in a snapshot, and
+    it can only be used from the thread that opened its database.
+
+    Private Attributes
+    ==================
+    _db: The hospital database.
+    """
+
+    _db: sqlite3.Connection
+
+    def __init__(self, address: str, db_name: str,
+                 cache_size: int = 128) -> None:
+        """ Open the hospital database <db_name> as a hospital at <address>,
+        creating it if it does not exist. <cache_size> is as for Hospital.
+        """
+        hospital.Hospital.__init__(self, address, cache_size)
+        self._db = loaddata.connect_database(db_name)
+        for id_num, name, salary in self._db.execute(
+                'SELECT * FROM doctors ORDER BY rowid'):
+            hospital.Hospital.hire_doctor(
+                self, hospital.Doctor(name, id_num, salary))
+        for id_num, name in self._db.execute(
+                'SELECT * FROM patients ORDER BY rowid'):
+            hospital.Hospital.admit_patient(
+                self, StoredPatient(name, id_num, self._db))
+        for date, names in self._db.execute(
+                'SELECT * FROM attendance ORDER BY rowid'):
+            hospital.Hospital.record_attendance(
+                self, datetime.date.fromordinal(date),
+                names.split(',') if names else [])
+        schedules = {}
+        for name, date in self._db.execute(
+                'SELECT * FROM schedules ORDER BY rowid'):
+            schedules.setdefault(name, []).append(
+                datetime.date.fromordinal(date))
+        hospital.Hospital.set_schedules(self, list(schedules.items()))
+
+    def __enter__(self) -> SQLHospital:
+        """ Return this hospital, for use in a with statement.
+        """
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """ Close this hospital at the end of a with statement.
+        """
+        self.close()
+
+    def commit(self) -> None:
+        """ Save the changes made to this hospital to its database file.
+        """
+        self._db.commit()
+
+    def close(self) -> None:
+        """ Save the changes made to this hospital to its database file, and
+        close it.
+        """
+        self._db.commit()
+        self._db.close()
+
+    def load_admissions(self, file_name: str, bulk: bool = False) -> None:
+        """
+        Add the visits of the admissions file <file_name> to the database of
+        this hospital, all at once. See Hospital.load_admissions.
+        """
+        with self.writing():
+            self.clear_cache()
+            loaddata.import_admissions(self._db, file_name, bulk)
+            self.file_offsets[os.path.abspath(file_name)] = \
+                os.path.getsize(file_name)
+            for patient in self.patients:
+                if isinstance(patient, StoredPatient):
+                    patient._forget_history()
+
+    def hire_doctor(self, doctor: hospital.Doctor) -> None:
+        """
+        Add the <doctor> to this hospital and its database.
+        """
+        self._db.execute('INSERT INTO doctors VALUES (?, ?, ?)',
+                         (doctor.id, doctor.name, doctor.salary))
+        hospital.Hospital.hire_doctor(self, doctor)
+
+    def admit_patient(self, patient: hospital.Patient) -> None:
+        """
+        Add the <patient> to this hospital and its database. The visits
+        already in the history of <patient> are not added to the database.
+        """
+        self._db.execute('INSERT INTO patients VALUES (?, ?)',
+                         (patient.id, patient.name))
+        hospital.Hospital.admit_patient(self, patient)
+
+    def record_visit(self, visit: hospital.HospitalVisit) -> None:
+        """
+        Add <visit> to the database of this hospital, and to the history of
+        the visiting patient if it has been read.
+
+        The patient of <visit> must already be admitted to this hospital.
+        """
+        with self.writing():
+            patient = self._patients_by_id[visit.patient_id]
+            self.clear_cache()
+            self._db.execute(
+                'INSERT INTO visits VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (visit.date.toordinal(), visit.doctor_id, visit.patient_id,
+                 visit.diagnosis, visit.prognosis, visit.prescribed,
+                 _ordinal(visit.followup_date, None)))
+            if isinstance(patient, StoredPatient):
+                patient._forget_history()
+            else:
+                patient.history.append(visit)
+
+    def record_attendance(self, date: datetime.date, names: List[str]) -> None:
+        """
+        Set the attendance roll of this hospital for <date> to the doctors
+        named in <names>, here and in its database.
+        """
+        self._db.execute('INSERT OR REPLACE INTO attendance VALUES (?, ?)',
+                         (date.toordinal(), ','.join(names)))
+        hospital.Hospital.record_attendance(self, date, names)
+
+    def set_schedules(self, schedules: List[Tuple[str, List[datetime.date]]]) \
+            -> None:
+        """
+        Replace the schedules of all the doctors of this hospital, here and in
+        its database. See Hospital.set_schedules.
+        """
+        self._db.execute('DELETE FROM schedules')
+        self._db.executemany('INSERT INTO schedules VALUES (?, ?)',
+                             [(name, date.toordinal())
+                              for name, dates in schedules for date in dates])
+        hospital.Hospital.set_schedules(self, schedules)
+
+    def _unique_patients(self, query: str,
+                         args: tuple) -> List[hospital.Patient]:
+        """ Return the patients with the ids in the rows of <query>, with
+        <args>, each listed once, in the order of their first row.
+        """
+        patients = {}
+        for patient_id, in self._db.execute(query, args):
+            if patient_id not in patients:
+                patients[patient_id] = self._patients_by_id[patient_id]
+        return list(patients.values())
+
+    @hospital._cached
+    def reminders(self, date: datetime.date,
+                  delta: int) -> List[hospital.Patient]:
+        """
+        Return a list of patients that have follow-up days scheduled within
+        <delta>-days of <date>. See Hospital.reminders.
+        """
+        return self._unique_patients(
+            'SELECT patient_id FROM visits WHERE followup_date BETWEEN ? AND ?'
+            ' ORDER BY followup_date, rowid',
+            (date.toordinal(), date.toordinal() + delta))
+
+    @hospital._cached
+    def reminders_for_range(self, start_date: datetime.date,
+                            end_date: datetime.date,
+                            delta: int) \
+            -> Dict[datetime.date, List[hospital.Patient]]:
+        """
+        Return a dictionary mapping every day from <start_date> to <end_date>
+        (inclusive) to the list of patients that have follow-up days scheduled
+        within <delta>-days of that day. See Hospital.reminders_for_range.
+        """
+        dates = []
+        patients = []
+        for followup, patient_id in self._db.execute(
+                'SELECT followup_date, patient_id FROM visits'
+                ' WHERE followup_date BETWEEN ? AND ?'
+                ' ORDER BY followup_date, rowid',
+                (start_date.toordinal(), end_date.toordinal() + delta)):
+            dates.append(datetime.date.fromordinal(followup))
+            patients.append(self._patients_by_id[patient_id])
+        return self._sweep_reminders(dates, patients, start_date, end_date,
+                                     delta)
+
+    @hospital._cached
+    def patients_seen(self, doctor: hospital.Doctor, start_date: datetime.date,
+                      end_date: datetime.date) -> int:
+        """
+        Return the NUMBER of unique patients who visited <doctor> during
+        <start_date> to <end_date> (inclusive).
+        """
+        return self._db.execute(
+            'SELECT COUNT(DISTINCT patient_id) FROM visits'
+            ' WHERE doctor_id = ? AND date BETWEEN ? AND ?',
+            (doctor.id, start_date.toordinal(),
+             end_date.toordinal())).fetchone()[0]
+
+    @hospital._cached
+    def visit_counts(self, start_date: datetime.date,
+                     end_date: datetime.date) -> Dict[int, int]:
+        """
+        Return a dictionary mapping the id of each doctor of this hospital to
+        the number of visits to that doctor during <start_date> to <end_date>
+        inclusive.
+        """
+        counts = {doctor.id: 0 for doctor in self.doctors}
+        for doctor_id, count in self._db.execute(
+                'SELECT doctor_id, COUNT(*) FROM visits'
+                ' WHERE date BETWEEN ? AND ? GROUP BY doctor_id',
+                (start_date.toordinal(), end_date.toordinal())):
+            if doctor_id in counts:
+                counts[doctor_id] = count
+        return counts
+
+    @hospital._cached
+    def patients_by_doctor(self, start_date: datetime.date,
+                           end_date: datetime.date) -> Dict[int, Set[int]]:
+        """
+        Return a dictionary mapping the id of each doctor who was visited
+        during <start_date> to <end_date> inclusive to the ids of the unique
+        patients who visited them then.
+        """
+        patients = {}
+        for doctor_id, patient_id in self._db.execute(
+                'SELECT DISTINCT doctor_id, patient_id FROM visits'
+                ' WHERE date BETWEEN ? AND ?',
+                (start_date.toordinal(), end_date.toordinal())):
+            patients.setdefault(doctor_id, set()).add(patient_id)
+        return patients
+
+    def _visits_between(self, start_date: datetime.date,
+                        end_date: datetime.date) \
+            -> List[Tuple[datetime.date, int, int]]:
+        """
+        Return the date, doctor id and patient id of every visit from
+        <start_date> to <end_date> (inclusive), in date order.
+        """
+        return [(datetime.date.fromordinal(date), doctor_id, patient_id)
+                for date, doctor_id, patient_id in self._db.execute(
+                    'SELECT date, doctor_id, patient_id FROM visits'
+                    ' WHERE date BETWEEN ? AND ? ORDER BY date',
+                    (start_date.toordinal(), end_date.toordinal()))]
+
+    @hospital._cached
+    def followup_compliance(self, start_date: Optional[datetime.date] = None,
+                            end_date: Optional[datetime.date] = None,
+                            doctor: Optional[hospital.Doctor] = None) \
+            -> Dict[int, Tuple[int, int]]:
+        """
+        Return the number of missed and kept followups of each patient, by
+        patient id. See Hospital.followup_compliance.
+        """
+        query = ('SELECT patient_id, SUM(visits_on != 1), SUM(visits_on = 1)'
+                 ' FROM (SELECT v.patient_id AS patient_id,'
+                 ' (SELECT COUNT(*) FROM visits w'
+                 ' WHERE w.patient_id = v.patient_id'
+                 ' AND w.date = v.followup_date) AS visits_on'
+                 ' FROM visits v WHERE v.followup_date IS NOT NULL'
+                 ' AND v.date BETWEEN ? AND ?')
+        args = [_ordinal(start_date, FIRST_DAY), _ordinal(end_date, LAST_DAY)]
+        if doctor is not None:
+            query += ' AND v.doctor_id = ?'
+            args.append(doctor.id)
+        query += ') GROUP BY patient_id'
+        return {patient_id: (missed, kept)
+                for patient_id, missed, kept in self._db.execute(query, args)}
+
+    @hospital._cached
+    def attended_to(self, patient: hospital.Patient) -> List[hospital.Doctor]:
+        """
+        Return a list of the unique doctors who have attended to <patient>.
+        """
+        return [self._doctors_by_id[doctor_id] for doctor_id, in
+                self._db.execute('SELECT DISTINCT doctor_id FROM visits'
+                                 ' WHERE patient_id = ?', (patient.id,))
+                if doctor_id in self._doctors_by_id]
+
+    @hospital._cached
+    def prescribed_rate(self, doctor: hospital.Doctor,
+                        medication: str) -> float:
+        """
+        Return the prescription rate for <doctor> given <medication>, or 0.0
+        if <doctor> has prescribed nothing. See Hospital.prescribed_rate.
+        """
+        medi_any, medi_yes = self._db.execute(
+            'SELECT COUNT(*), SUM(prescribed = ?) FROM visits'
+            ' WHERE doctor_id = ? AND prescribed IS NOT NULL',
+            (medication, doctor.id)).fetchone()
+        if medi_any == 0:
+            return 0.0
+        return (medi_yes / medi_any) * 100
+
+    @hospital._cached
+    def prescription_rates(self) -> Dict[int, Dict[str, float]]:
+        """
+        Return the prescription rate of every medication prescribed at this
+        hospital for every doctor, by doctor id and then medication.
+        """
+        counts = {}
+        medications = set()
+        for doctor_id, medication, count in self._db.execute(
+                'SELECT doctor_id, prescribed, COUNT(*) FROM visits'
+                ' WHERE prescribed IS NOT NULL'
+                ' GROUP BY doctor_id, prescribed'):
+            counts.setdefault(doctor_id, {})[medication] = count
+            medications.add(medication)
+        final = {}
+        for doctor in self.doctors:
+            doctor_counts = counts.get(doctor.id, {})
+            medi_any = sum(doctor_counts.values())
+            final[doctor.id] = {
+                medication: (doctor_counts.get(medication, 0) / medi_any) * 100
+                if medi_any else 0.0 for medication in medications}
+        return final
+
+    @hospital._cached
+    def top_medications(self, k: int, doctor: Optional[hospital.Doctor] = None,
+                        start_date: Optional[datetime.date] = None,
+                        end_date: Optional[datetime.date] = None) \
+            -> List[Tuple[str, int]]:
+        """
+        Return the <k> medications prescribed in the most visits, with the
+        number of those visits. See Hospital.top_medications.
+        """
+        query = ('SELECT prescribed, COUNT(*) FROM visits'
+                 ' WHERE prescribed IS NOT NULL AND date BETWEEN ? AND ?')
+        args = [_ordinal(start_date, FIRST_DAY), _ordinal(end_date, LAST_DAY)]
+        if doctor is not None:
+            query += ' AND doctor_id = ?'
+            args.append(doctor.id)
+        query += ' GROUP BY prescribed ORDER BY COUNT(*) DESC, prescribed' \
+                 ' LIMIT ?'
+        args.append(k)
+        return [tuple(row) for row in self._db.execute(query, args)]
+
+    @hospital._cached
+    def prescribed_patients(self, medication: str,
+                            start_date: Optional[datetime.date] = None,
+                            end_date: Optional[datetime.date] = None) \
+            -> List[hospital.Patient]:
+        """
+        Return the patients who were prescribed <medication> at a visit from
+        <start_date> to <end_date> (inclusive), each listed once. See
+        Hospital.prescribed_patients.
+        """
+        return self._unique_patients(
+            'SELECT patient_id FROM visits WHERE prescribed = ?'
+            ' AND date BETWEEN ? AND ? ORDER BY date, rowid',
+            (medication, _ordinal(start_date, FIRST_DAY),
+             _ordinal(end_date, LAST_DAY)))
+
+    @hospital._cached
+    def diagnosed_patients(self, diagnosis: str,
+                           start_date: Optional[datetime.date] = None,
+                           end_date: Optional[datetime.date] = None) \
+            -> List[hospital.Patient]:
+        """
+        Return the patients who were diagnosed with <diagnosis> at a visit from
+        <start_date> to <end_date> (inclusive), each listed once. See
+        Hospital.diagnosed_patients.
+        """
+        return self._unique_patients(
+            'SELECT patient_id FROM visits WHERE diagnosis = ?'
+            ' AND date BETWEEN ? AND ? ORDER BY date, rowid',
+            (diagnosis, _ordinal(start_date, FIRST_DAY),
+             _ordinal(end_date, LAST_DAY)))
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,85 @@
+"""
+Hospital queries answered in one pass over an admissions file, without
+loading it into a Hospital, for files too large to hold in memory.
+
+Each function reads the visits with loaddata.iter_admissions, so none of
+them keeps more than one visit at a time.
+"""
+
+from __future__ import annotations
+from typing import Dict, Optional, Set
+import datetime
+import loaddata
+
+
+def prescribed_rate(file_name: str, doctor_id: int, medication: str) -> float:
+    """
+    Return the prescription rate of <medication> for the doctor with id
+    <doctor_id> in the admissions file <file_name>, as defined by
+    Hospital.prescribed_rate, or 0.0 if that doctor has no visits.
+
+    Runs in constant memory.
+
+    >>> round(prescribed_rate('data/year97/admissions.csv', 99824163,
+    ...                       'Amiodarone HCl'), 2)
+    2.47
+    """
+    medi_yes = 0
+    medi_any = 0
+    for visit in loaddata.iter_admissions(file_name, doctor_id=doctor_id):
+        medi_any += 1
+        if visit.prescribed == medication:
+            medi_yes += 1
+    if medi_any == 0:
+        return 0.0
+    return (medi_yes / medi_any) * 100
+
+
+def prescription_counts(file_name: str,
+                        start_date: Optional[datetime.date] = None,
+                        end_date: Optional[datetime.date] = None) \
+        -> Dict[str, int]:
+    """
+    Return the number of visits in the admissions file <file_name> from
+    <start_date> to <end_date> (inclusive) in which each medication was
+    prescribed. Leaving either date as None leaves that end of the range open.
+
+    Uses memory for one count per distinct medication.
+
+    >>> counts = prescription_counts('data/janonly/admissions.csv',
+    ...                              datetime.date(2017, 1, 1),
+    ...                              datetime.date(2017, 1, 31))
+    >>> counts['Lidocaine']
+    4
+    """
+    counts = {}
+    for visit in loaddata.iter_admissions(file_name, start_date, end_date):
+        counts[visit.prescribed] = counts.get(visit.prescribed, 0) + 1
+    return counts
+
+
+def patients_seen(file_name: str, start_date: datetime.date,
+                  end_date: datetime.date) -> Dict[int, int]:
+    """
+    Return the number of unique patients who visited each doctor during
+    <start_date> to <end_date> (inclusive), by doctor id, in the admissions
+    file <file_name>. Doctors with no visits in that range are left out.
+
+    Uses memory for each distinct doctor and patient pair, however many
+    visits there are.
+
+    >>> seen = patients_seen('data/year97/admissions.csv',
+    ...                      datetime.date(1997, 1, 1),
+    ...                      datetime.date(1997, 2, 1))
+    >>> seen[99991977]
+    8
+    """
+    patients: Dict[int, Set[int]] = {}
+    for visit in loaddata.iter_admissions(file_name, start_date, end_date):
+        patients.setdefault(visit.doctor_id, set()).add(visit.patient_id)
+    return {doctor_id: len(patients[doctor_id]) for doctor_id in patients}
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,317 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import compress
+import datetime
+
+# Stands in for a missing followup date in the followup column.
+NO_FOLLOWUP = 0
+
+
+class _Encoding:
+    """A dictionary encoding of strings as small integer codes.
+
+    Sample Usage
+    ============
+    >>> drugs = _Encoding()
+    >>> drugs.encode('Lithium'), drugs.encode('Advil'), drugs.encode('Lithium')
+    (0, 1, 0)
+    >>> drugs.values[1]
+    'Advil'
+    >>> drugs.code('Propofol')
+    -1
+    """
+
+    values: List[str]
+    _codes: Dict[str, int]
+
+    def __init__(self) -> None:
+        """ Initialize this empty _Encoding.
+        """
+        self.values = []
+        self._codes = {}
+
+    def encode(self, value: str) -> int:
+        """ Return the code of <value>, adding it to this encoding if it is
+        new.
+        """
+        if value not in self._codes:
+            self._codes[value] = len(self.values)
+            self.values.append(value)
+        return self._codes[value]
+
+    def code(self, value: str) -> int:
+        """ Return the code of <value>, or -1 if it has never been encoded.
+        """
+        return self._codes.get(value, -1)
+
+
+class VisitStore:
+    """A columnar store of hospital visits.
+
+    Each visit is one row across a set of typed arrays instead of a
+    HospitalVisit object: dates as ordinals, doctor and patient ids as
+    integers, and diagnosis, prognosis and prescribed as codes into a
+    dictionary encoding.
+
+    Rows are kept in visit date order, so date range queries first narrow the
+    columns to a slice with a binary search. As with the Hospital indexes,
+    rows may be appended in any order; they are sorted the first time the
+    store is queried after an out-of-order append. The visit dates and
+    patients of each doctor are also kept apart, in date order, so that the
+    queries about doctors only look at the rows of the doctors and dates
+    they are about, and the visits and prescriptions of each doctor are
+    counted as rows are appended.
+
+    Queries take and return doctor and patient ids rather than Doctor and
+    Patient objects, since the store holds no objects.
+
+    Public Attributes
+    =================
+    diagnoses: The encoding of the diagnosis column.
+    prognoses: The encoding of the prognosis column.
+    medications: The encoding of the prescribed column.
+
+    Private Attributes
+    ==================
+    _visits: The number of rows of each doctor, by doctor id.
+    _prescribed: The number of rows of each doctor with each prescribed
+        code, by (doctor id, code).
+    _doctor_rows: The visit dates and patient ids of the rows of each
+        doctor, in date order, by doctor id, or None if they have to be
+        rebuilt after an append.
+    _followup_dates: The followup dates of the rows, in date order, or None
+        if they have to be rebuilt after an append.
+    _followup_patients: The patient ids of the rows of _followup_dates.
+
+    Sample Usage
+    ============
+    >>> store = VisitStore()
+    >>> store.append(datetime.date(2017, 10, 23), 99722708, 44123123,\
+                     "Dengue Fever", "very poor", "Sucralfate",\
+                     datetime.date(2017, 11, 30))
+    >>> store.append(datetime.date(2017, 10, 2), 99722708, 44000001,\
+                     "Cold", "good", "Advil", None)
+    >>> len(store)
+    2
+    >>> store.patients_seen(99722708, datetime.date(2017, 10, 1),\
+                            datetime.date(2017, 10, 31))
+    2
+    >>> store.prescribed_rate(99722708, "Advil")
+    50.0
+    >>> store.reminders(datetime.date(2017, 11, 29), 1)
+    [44123123]
+    >>> import loaddata
+    >>> store = loaddata.load_visit_store('data/year97/admissions.csv')
+    >>> d1 = datetime.date(1997, 1, 1)
+    >>> d2 = datetime.date(1997, 2, 1)
+    >>> sorted(store.busiest_doctors(d1, d2))
+    [99298240, 99817905]
+    >>> store.patient_counts(d1, d2)[99298240]
+    10
+    >>> store.patients_seen(99991977, d1, d2)
+    8
+    >>> round(store.prescribed_rate(99824163, 'Amiodarone HCl'), 2)
+    2.47
+    >>> sorted(store.reminders(datetime.date(1997, 10, 17), 3)) \
+        #doctest: +NORMALIZE_WHITESPACE
+    [44045550, 44070721, 44139185, 44172567, 44222838, 44248993, 44269262,
+     44358472, 44366714, 44964920]
+    """
+
+    diagnoses: _Encoding
+    prognoses: _Encoding
+    medications: _Encoding
+    _dates: array
+    _doctor_ids: array
+    _patient_ids: array
+    _followups: array
+    _diagnosis_codes: array
+    _prognosis_codes: array
+    _prescribed_codes: array
+    _sorted: bool
+    _visits: Counter
+    _prescribed: Counter
+    _doctor_rows: Optional[Dict[int, Tuple[array, array]]]
+    _followup_dates: Optional[array]
+    _followup_patients: Optional[array]
+
+    def __init__(self) -> None:
+        """ Initialize this empty VisitStore.
+        """
+        self.diagnoses = _Encoding()
+        self.prognoses = _Encoding()
+        self.medications = _Encoding()
+
+        self._dates = array('i')
+        self._doctor_ids = array('q')
+        self._patient_ids = array('q')
+        self._followups = array('i')
+        self._diagnosis_codes = array('i')
+        self._prognosis_codes = array('i')
+        self._prescribed_codes = array('i')
+
+        self._sorted = True
+        self._visits = Counter()
+        self._prescribed = Counter()
+        self._doctor_rows = None
+        self._followup_dates = None
+        self._followup_patients = None
+
+    def __len__(self) -> int:
+        """ Return the number of visits in this VisitStore.
+        """
+        return len(self._dates)
+
+    def append(self, date: datetime.date, doctor_id: int, patient_id: int,
+               diagnosis: str, prognosis: str, prescribed: str,
+               followup: Optional[datetime.date]) -> None:
+        """ Add one visit to this VisitStore, given the same fields as a
+        HospitalVisit.
+        """
+        ordinal = date.toordinal()
+        if self._dates and ordinal < self._dates[-1]:
+            self._sorted = False
+        self._dates.append(ordinal)
+        self._doctor_ids.append(doctor_id)
+        self._patient_ids.append(patient_id)
+        self._followups.append(NO_FOLLOWUP if followup is None
+                               else followup.toordinal())
+        self._diagnosis_codes.append(self.diagnoses.encode(diagnosis))
+        self._prognosis_codes.append(self.prognoses.encode(prognosis))
+        code = self.medications.encode(prescribed)
+        self._prescribed_codes.append(code)
+        self._visits[doctor_id] += 1
+        self._prescribed[(doctor_id, code)] += 1
+        self._doctor_rows = None
+        self._followup_dates = None
+        self._followup_patients = None
+
+    def _sort(self) -> None:
+        """ Put the rows of this store in visit date order, if they are not
+        already.
+        """
+        if self._sorted:
+            return
+        order = sorted(range(len(self._dates)), key=self._dates.__getitem__)
+        for name in ('_dates', '_doctor_ids', '_patient_ids', '_followups',
+                     '_diagnosis_codes', '_prognosis_codes',
+                     '_prescribed_codes'):
+            column = getattr(self, name)
+            setattr(self, name,
+                    array(column.typecode, map(column.__getitem__, order)))
+        self._sorted = True
+
+    def _rows_by_doctor(self) -> Dict[int, Tuple[array, array]]:
+        """ Return the visit dates and patient ids of the rows of each doctor,
+        in date order, by doctor id, splitting them out of the columns if
+        rows have been appended since they last were.
+        """
+        if self._doctor_rows is None:
+            self._sort()
+            rows = {}
+            for date, doctor_id, patient_id in zip(
+                    self._dates, self._doctor_ids, self._patient_ids):
+                if doctor_id not in rows:
+                    rows[doctor_id] = (array('i'), array('q'))
+                rows[doctor_id][0].append(date)
+                rows[doctor_id][1].append(patient_id)
+            self._doctor_rows = rows
+        return self._doctor_rows
+
+    def _patients_between(self, dates: array, patient_ids: array,
+                          start: datetime.date, end: datetime.date) -> array:
+        """ Return the <patient_ids> of the rows of one doctor, with visit
+        <dates>, that are dated <start> to <end> (inclusive).
+        """
+        return patient_ids[bisect_left(dates, start.toordinal()):
+                           bisect_right(dates, end.toordinal())]
+
+    def prescribed_rate(self, doctor_id: int, medication: str) -> float:
+        """ Return the prescription rate of <medication> for the doctor with
+        id <doctor_id>, as defined by Hospital.prescribed_rate.
+
+        Returns 0.0 if that doctor has no visits.
+        """
+        visits = self._visits[doctor_id]
+        if visits == 0:
+            return 0.0
+        code = self.medications.code(medication)
+        return self._prescribed[(doctor_id, code)] / visits * 100
+
+    def patients_seen(self, doctor_id: int, start_date: datetime.date,
+                      end_date: datetime.date) -> int:
+        """ Return the number of unique patients who visited the doctor with id
+        <doctor_id> from <start_date> to <end_date> (inclusive).
+        """
+        if doctor_id not in self._visits:
+            return 0
+        dates, patient_ids = self._rows_by_doctor()[doctor_id]
+        return len(set(self._patients_between(dates, patient_ids, start_date,
+                                              end_date)))
+
+    def visit_counts(self, start_date: datetime.date,
+                     end_date: datetime.date) -> Dict[int, int]:
+        """ Return the number of visits to each doctor id from <start_date> to
+        <end_date> (inclusive). Doctors with no visits are left out.
+        """
+        counts = {}
+        for doctor_id, (dates, _) in self._rows_by_doctor().items():
+            count = bisect_right(dates, end_date.toordinal()) - \
+                bisect_left(dates, start_date.toordinal())
+            if count > 0:
+                counts[doctor_id] = count
+        return counts
+
+    def patient_counts(self, start_date: datetime.date,
+                       end_date: datetime.date) -> Dict[int, int]:
+        """ Return the number of unique patients who visited each doctor id
+        from <start_date> to <end_date> (inclusive). Doctors with no visits
+        are left out.
+        """
+        counts = {}
+        for doctor_id, (dates, patient_ids) in self._rows_by_doctor().items():
+            seen = self._patients_between(dates, patient_ids, start_date,
+                                          end_date)
+            if seen:
+                counts[doctor_id] = len(set(seen))
+        return counts
+
+    def busiest_doctors(self, start_date: datetime.date,
+                        end_date: datetime.date) -> List[int]:
+        """ Return the ids of the doctors who saw the most unique patients
+        from <start_date> to <end_date> (inclusive), in any order, as
+        Hospital.busiest_doctors does.
+
+        Unlike Hospital.busiest_doctors, this returns an empty list when there
+        are no visits at all in that range, since the store does not know
+        about doctors who never had a visit.
+        """
+        counts = self.patient_counts(start_date, end_date)
+        if not counts:
+            return []
+        high = max(counts.values())
+        return [doctor_id for doctor_id in counts if counts[doctor_id] == high]
+
+    def reminders(self, date: datetime.date, delta: int) -> List[int]:
+        """ Return the ids of the patients that have follow-up days scheduled
+        within <delta>-days of <date>, each listed once.
+        """
+        if self._followup_dates is None:
+            order = sorted(compress(range(len(self._followups)),
+                                    self._followups),
+                           key=self._followups.__getitem__)
+            self._followup_dates = array(
+                'i', map(self._followups.__getitem__, order))
+            self._followup_patients = array(
+                'q', map(self._patient_ids.__getitem__, order))
+        low = bisect_left(self._followup_dates, date.toordinal())
+        high = bisect_right(self._followup_dates, date.toordinal() + delta)
+        return list(dict.fromkeys(self._followup_patients[low:high]))
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()